@@ -0,0 +1,142 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from report import Pdf
+
+# Batch report generation for a production line: one row per camera in a CSV manifest, one PDF per camera plus a combined summary
+#
+# Manifest columns: camera_id, chessboard_dir, focus_image, intensity_image, colorcard_image
+#
+#   python batch.py cameras.csv --output-dir reports --workers 4
+#
+# Every finished camera leaves <camera_id>.json (summary) and <camera_id>.results.json (measurements, see report.py --render)
+# next to its PDF. Cameras that already have a summary are skipped, so an interrupted run picks up where it stopped
+# when started again with the same output directory. A camera whose PDF was not built or whose metrics had errors gets
+# <camera_id>.failed.json instead, is reported as failed and is retried on the next run
+#
+# Cameras run in parallel processes, so each process keeps OpenCV and the corner detection to one thread
+class Batch:
+
+    manifestColumns = ("camera_id", "chessboard_dir", "focus_image", "intensity_image", "colorcard_image")
+    chessboardExtensions = ("*.tif", "*.tiff", "*.png", "*.jpg", "*.jpeg", "*.bmp")
+    summaryColumns = ("camera_id", "output", "pdf_built", "focus_value", "focus_pass", "reprojection_error", "reprojection_pass",
+                      "light_intensity", "light_intensity_pass", "color_max_distance", "color_max_distance_corrected", "color_pass", "errors")
+
+    def read_manifest(manifestPath):
+        with open(manifestPath, newline="") as f:
+            reader = csv.DictReader(f)
+            missing = set(Batch.manifestColumns) - set(reader.fieldnames or [])
+            if missing:
+                raise ValueError(f"Manifest is missing column(s): {sorted(missing)}")
+            return [row for row in reader if row["camera_id"].strip()]
+
+    def chessboard_paths(chessboardDir):
+        paths = []
+        for pattern in Batch.chessboardExtensions:
+            paths.extend(glob.glob(os.path.join(chessboardDir, pattern)))
+        return sorted(set(paths))
+
+    def result_path(outputDir, cameraId):
+        return os.path.join(outputDir, f"{cameraId}.json")
+
+    def failed_path(outputDir, cameraId):
+        return os.path.join(outputDir, f"{cameraId}.failed.json")
+
+    def succeeded(summary):
+        return bool(summary["pdf_built"]) and not summary["errors"]
+
+    # Pool initializer, one OpenCV thread per process instead of one per CPU in every process
+    def init_worker():
+        cv2.setNumThreads(1)
+
+    # Runs in a worker process: builds one camera's report and records its summary
+    def run_camera(row, outputDir):
+        cameraId = row["camera_id"].strip()
+        summary = Pdf.report(focusImagePath=row["focus_image"],
+                             intensityImagePath=row["intensity_image"],
+                             colorcardImagePath=row["colorcard_image"],
+                             chessboardPaths=Batch.chessboard_paths(row["chessboard_dir"]),
+                             output=os.path.join(outputDir, f"{cameraId}.pdf"),
+                             resultsPath=os.path.join(outputDir, f"{cameraId}.results.json"),
+                             calibrationWorkers=1)
+        summary["camera_id"] = cameraId
+
+        # Written last and renamed into place, so only cameras that finished successfully count as done on resume
+        failedPath = Batch.failed_path(outputDir, cameraId)
+        resultPath = Batch.result_path(outputDir, cameraId) if Batch.succeeded(summary) else failedPath
+        with open(resultPath + ".tmp", "w") as f:
+            json.dump(summary, f, indent=2)
+        os.replace(resultPath + ".tmp", resultPath)
+        if resultPath != failedPath and os.path.exists(failedPath):
+            os.remove(failedPath)
+        return summary
+
+    def write_summary(rows, outputDir):
+        summaryPath = os.path.join(outputDir, "summary.csv")
+        with open(summaryPath, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=Batch.summaryColumns, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                resultPath = Batch.result_path(outputDir, row["camera_id"].strip())
+                if not os.path.exists(resultPath):
+                    resultPath = Batch.failed_path(outputDir, row["camera_id"].strip())
+                if not os.path.exists(resultPath):
+                    continue
+                with open(resultPath) as result:
+                    summary = json.load(result)
+                summary["errors"] = "; ".join(f"{name}: {error}" for name, error in summary.get("errors", {}).items())
+                writer.writerow(summary)
+        return summaryPath
+
+    def run(manifestPath, outputDir, workers=None):
+        os.makedirs(outputDir, exist_ok=True)
+        rows = Batch.read_manifest(manifestPath)
+        pending = [row for row in rows if not os.path.exists(Batch.result_path(outputDir, row["camera_id"].strip()))]
+        print(f"{len(rows)} cameras in manifest, {len(rows) - len(pending)} already done, {len(pending)} to process")
+
+        start = time.perf_counter()
+        done = 0
+        failed = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=Batch.init_worker) as pool:
+            futures = {pool.submit(Batch.run_camera, row, outputDir): row["camera_id"].strip() for row in pending}
+            for future in as_completed(futures):
+                cameraId = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    failed.append(cameraId)
+                    print(f"[{cameraId}] failed: {e}")
+                    continue
+                if not Batch.succeeded(summary):
+                    failed.append(cameraId)
+                    reason = "; ".join(f"{name}: {error}" for name, error in summary["errors"].items()) or "PDF was not built"
+                    print(f"[{cameraId}] failed: {reason}")
+                else:
+                    done += 1
+                    elapsed = time.perf_counter() - start
+                    print(f"[{cameraId}] done ({done}/{len(pending)}, {done / elapsed * 60:.2f} cameras/min)")
+
+        elapsed = time.perf_counter() - start
+        summaryPath = Batch.write_summary(rows, outputDir)
+        if done:
+            print(f"Processed {done} cameras in {elapsed:.1f}s ({done / elapsed * 60:.2f} cameras/min)")
+        if failed:
+            print(f"Failed: {', '.join(failed)} (run again to retry)")
+        print(f"Summary written to {summaryPath}")
+        return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate calibration reports for every camera in a manifest")
+    parser.add_argument("manifest", help="CSV with columns " + ", ".join(Batch.manifestColumns))
+    parser.add_argument("--output-dir", default="reports", help="where the PDFs, per-camera results and summary.csv go")
+    parser.add_argument("--workers", type=int, default=None, help="number of cameras processed in parallel (default: CPU count)")
+    args = parser.parse_args()
+    Batch.run(args.manifest, args.output_dir, args.workers)
@@ -0,0 +1,138 @@
+import numpy as np
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from resolution import Resolution
+
+#Incremental camera calibration for use while frames are being captured
+#Each frame added is detected on a background thread, then the intrinsics are re-estimated starting from the previous solution
+#(CALIB_USE_INTRINSIC_GUESS), so the operator sees the running reprojection error and how much of the view the board has covered
+#and can stop capturing once the solution has converged
+#
+#   session = CalibrationSession()
+#   for frame in frames:
+#       session.addFrame(frame)
+#       print(session.status())
+#       if session.converged(): break
+#   session.close()
+class CalibrationSession:
+    #target is a calibration target from targets.py, by default Resolution's chessboard
+    def __init__(self, minFrames=5, convergenceWindow=3, convergenceTolerance=0.02, minCoverage=0.6, coverageGrid=(4, 4),
+                 maxDetectSide=None, fastCheck=True, target=None):
+        #Calibration is only attempted once minFrames boards were found
+        self.minFrames = minFrames
+        #Converged once the last convergenceWindow errors are within convergenceTolerance (relative) of each other
+        #and at least minCoverage of the coverageGrid cells of the image have had a corner in them
+        self.convergenceWindow = convergenceWindow
+        self.convergenceTolerance = convergenceTolerance
+        self.minCoverage = minCoverage
+        self.maxDetectSide = Resolution.maxDetectSide if maxDetectSide is None else maxDetectSide
+        self.fastCheck = fastCheck
+        self.target = target if target is not None else Resolution.defaultTarget()
+
+        self.worldPtsList = []
+        self.imgPtsList = []
+        self.imageSize = None
+        self.rejectedFrames = 0
+        self.coverage = np.zeros(coverageGrid, dtype=bool)
+
+        self.cameraMatrix = None
+        self.distCoefficients = None
+        self.rvecs = []
+        self.tvecs = []
+        self.errorHistory = []
+
+        self._lock = Lock()
+        #One worker keeps frames in capture order and never runs two calibrations at once
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
+    #Queues a frame (BGR array or path), returns a Future that resolves to status() after the frame has been processed
+    def addFrame(self, frame):
+        return self._pool.submit(self._processFrame, frame)
+
+    def _processFrame(self, frame):
+        corners, ids, imageSize, seconds = Resolution.detectTarget(frame, self.target, self.maxDetectSide, self.fastCheck)
+        with self._lock:
+            if corners is None or (self.imageSize is not None and imageSize != self.imageSize):
+                self.rejectedFrames += 1
+                return self._status()
+            self.imageSize = imageSize
+            self.worldPtsList.append(self.target.objectPoints(ids))
+            self.imgPtsList.append(corners)
+            self._updateCoverage(corners)
+            worldPtsList = list(self.worldPtsList)
+            imgPtsList = list(self.imgPtsList)
+            cameraMatrix = None if self.cameraMatrix is None else self.cameraMatrix.copy()
+            distCoefficients = None if self.distCoefficients is None else self.distCoefficients.copy()
+
+        if len(imgPtsList) >= self.minFrames:
+            #Warm start from the previous solution, it is usually only a small correction away
+            flags = cv2.CALIB_USE_INTRINSIC_GUESS if cameraMatrix is not None else 0
+            reproductionError, cameraMatrix, distCoefficients, rvecs, tvecs = cv2.calibrateCamera(
+                worldPtsList, imgPtsList, imageSize, cameraMatrix, distCoefficients, flags=flags)
+            with self._lock:
+                self.cameraMatrix = cameraMatrix
+                self.distCoefficients = distCoefficients
+                self.rvecs = list(rvecs)
+                self.tvecs = list(tvecs)
+                self.errorHistory.append(reproductionError)
+
+        with self._lock:
+            return self._status()
+
+    def _updateCoverage(self, corners):
+        gridRows, gridCols = self.coverage.shape
+        width, height = self.imageSize
+        pts = corners.reshape(-1, 2)
+        cols = np.clip((pts[:, 0] * gridCols / width).astype(int), 0, gridCols - 1)
+        rows = np.clip((pts[:, 1] * gridRows / height).astype(int), 0, gridRows - 1)
+        self.coverage[rows, cols] = True
+
+    #Angle between each board and the image plane in degrees, a good set has a spread of tilts as well as positions
+    def _tilts(self):
+        tilts = []
+        for rvec in self.rvecs:
+            rotation, _ = cv2.Rodrigues(rvec)
+            tilts.append(float(np.degrees(np.arccos(min(1.0, abs(rotation[2, 2]))))))
+        return tilts
+
+    def _converged(self):
+        if len(self.errorHistory) < self.convergenceWindow or self.coverage.mean() < self.minCoverage:
+            return False
+        recent = self.errorHistory[-self.convergenceWindow:]
+        return (max(recent) - min(recent)) <= self.convergenceTolerance * recent[-1]
+
+    def _status(self):
+        tilts = self._tilts()
+        return {
+            "frames": len(self.imgPtsList),
+            "rejectedFrames": self.rejectedFrames,
+            "reprojectionError": self.errorHistory[-1] if self.errorHistory else None,
+            "coverage": float(self.coverage.mean()),
+            "tiltRange": (min(tilts), max(tilts)) if tilts else None,
+            "converged": self._converged(),
+        }
+
+    def status(self):
+        with self._lock:
+            return self._status()
+
+    def converged(self):
+        with self._lock:
+            return self._converged()
+
+    #Same tuple as Resolution.calibrate for the current solution (None until minFrames boards were found)
+    def result(self):
+        with self._lock:
+            reproductionError = self.errorHistory[-1] if self.errorHistory else None
+            return self.cameraMatrix, reproductionError, self.distCoefficients
+
+    #Waits for every queued frame to be processed
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,6 +1,9 @@
 import cv2
-import math
+import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+from tiledimage import TiledImage
 
 class Color:
 
@@ -16,144 +19,240 @@ class Color:
 
         return avg_light_intensity
 
-    # Extend a line segment by a specified length in both directions, this was to account for Hough line detection not fully covering the grid lines
-    def extend_line(x1, y1, x2, y2, length=20):
-        
-        dx = x2 - x1
-        dy = y2 - y1
-        line_len = math.hypot(dx, dy)
-        if line_len == 0:
-            return x1, y1, x2, y2
-        scale = length / line_len
-        x1_new = int(x1 - dx * scale)
-        y1_new = int(y1 - dy * scale)
-        x2_new = int(x2 + dx * scale)
-        y2_new = int(y2 + dy * scale)
-        return x1_new, y1_new, x2_new, y2_new
-
-    def colorbalance(img, rows=6, cols=4):
-        
-        blurred = cv2.GaussianBlur(img, (5,5), 0)
+    # Illumination statistics of a whole image in one pass over row strips, only one strip is ever converted to gray
+    # image is a TiledImage (or a BGR/gray array). Returns a JSON-friendly dict:
+    #   mean, std, min, max             of the gray values
+    #   percentiles                     {"p5": value, ...}, nearest-rank values read off the histogram
+    #   clipped_dark, clipped_bright    fraction of pixels <= clipLow / >= clipHigh
+    #   grid                            mean gray value of every cell of a rows x cols grid over the image
+    #                                   (at most one cell per pixel, a grid larger than the image is reduced to the image size)
+    #   uniformity                      darkest grid cell / brightest grid cell (1.0 = perfectly even)
+    #   corner_falloff                  mean of the four corner cells / mean of the centre cell(s), the vignetting
+    #   histogram                       256 pixel counts
+    def light_intensity_statistics(image, stripRows=512, grid=(4, 4), percentiles=(1, 5, 50, 95, 99), clipLow=0, clipHigh=255):
+        if isinstance(image, np.ndarray):
+            image = TiledImage.fromArray(image)
+        if min(grid) < 1:
+            raise ValueError("The grid needs at least one row and one column")
+        gridRows, gridCols = min(grid[0], image.height), min(grid[1], image.width)
+        rowEdges = np.linspace(0, image.height, gridRows + 1).astype(int)
+        colEdges = np.linspace(0, image.width, gridCols + 1).astype(int)
+        histogram = np.zeros(256, dtype=np.float64)
+        cellSums = np.zeros((gridRows, gridCols), dtype=np.float64)
+
+        for y0, y1, strip in image.strips(stripRows):
+            gray = strip if strip.ndim == 2 else cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY)
+            histogram += cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+            # Column sums of the part of the strip inside each grid row, then summed per grid column
+            for r in range(gridRows):
+                a, b = max(rowEdges[r], y0), min(rowEdges[r + 1], y1)
+                if a >= b:
+                    continue
+                columnSums = cv2.reduce(gray[a - y0:b - y0], 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+                cellSums[r] += np.add.reduceat(columnSums.astype(np.int64), colEdges[:-1])
+
+        total = histogram.sum()
+        values = np.arange(256)
+        mean = float(histogram @ values / total)
+        std = float(np.sqrt(max(histogram @ values.astype(np.float64) ** 2 / total - mean ** 2, 0.0)))
+        cdf = np.cumsum(histogram)
+        ranks = np.maximum(np.asarray(percentiles, dtype=np.float64) / 100.0 * total, 1)
+        percentileValues = np.searchsorted(cdf, ranks).tolist()
+        present = np.flatnonzero(histogram)
+
+        cellMeans = cellSums / np.outer(np.diff(rowEdges), np.diff(colEdges))
+        centre = cellMeans[(gridRows - 1) // 2:gridRows // 2 + 1, (gridCols - 1) // 2:gridCols // 2 + 1].mean()
+        corners = cellMeans[[0, 0, -1, -1], [0, -1, 0, -1]].mean()
+
+        return {
+            "mean": mean,
+            "std": std,
+            "min": int(present[0]),
+            "max": int(present[-1]),
+            "percentiles": {f"p{p:g}": int(v) for p, v in zip(percentiles, percentileValues)},
+            "clipped_dark": float(histogram[:clipLow + 1].sum() / total),
+            "clipped_bright": float(histogram[clipHigh:].sum() / total),
+            "grid": cellMeans.tolist(),
+            "uniformity": float(cellMeans.min() / cellMeans.max()) if cellMeans.max() > 0 else 0.0,
+            "corner_falloff": float(corners / centre) if centre > 0 else 0.0,
+            "histogram": histogram.astype(np.int64).tolist(),
+        }
+
+    # Per-cell color statistics of a card crop split into a rows x cols grid, computed for all cells in one vectorized step
+    # inset is the fraction of each cell trimmed off every side so the black grid borders are not sampled
+    # trim is the fraction of the darkest and brightest pixels dropped from each end for the trimmed mean
+    # Returns {"mean", "median", "trimmed_mean"}, each a (rows, cols, 3) float array in the channel order of the crop
+    # statistics limits the result to the ones named, e.g. ("median",) skips the full sort the trimmed mean needs
+    def cell_statistics(crop, rows, cols, inset=0.15, trim=0.1, statistics=("mean", "median", "trimmed_mean")):
+        cell_h = crop.shape[0] // rows
+        cell_w = crop.shape[1] // cols
+        channels = crop.shape[2]
+
+        # (rows, cols, cell_h, cell_w, channels) view of the crop, no pixels are copied
+        cells = crop[:rows*cell_h, :cols*cell_w].reshape(rows, cell_h, cols, cell_w, channels).swapaxes(1, 2)
+        inset_y = min(int(cell_h * inset), (cell_h - 1) // 2)
+        inset_x = min(int(cell_w * inset), (cell_w - 1) // 2)
+        cells = cells[:, :, inset_y:cell_h-inset_y, inset_x:cell_w-inset_x]
+        pixels = cells.reshape(rows, cols, -1, channels)
+
+        result = {}
+        if "mean" in statistics:
+            result["mean"] = pixels.mean(axis=2)
+        if "trimmed_mean" in statistics:
+            ordered = np.sort(pixels, axis=2)
+            cut = int(ordered.shape[2] * trim)
+            trimmed = ordered[:, :, cut:ordered.shape[2]-cut] if cut > 0 else ordered
+            result["trimmed_mean"] = trimmed.mean(axis=2)
+            if "median" in statistics:
+                result["median"] = np.median(ordered, axis=2)
+        elif "median" in statistics:
+            # Partial sort only
+            result["median"] = np.median(pixels, axis=2)
+        return result
+
+    # Card localization on a copy downscaled so its longest side is at most detectSide pixels (0 = full resolution)
+    # The card is the group of saturated, bright blobs with the largest total area: the patches, which are separate blobs
+    # when the black grid between them is wide and one blob when it is not. A blob joins a group when its gap to a blob
+    # already in it is at most half a blob side, so the result does not depend on the grid width or the card's rotation.
+    # The outline of the group is reduced to a quadrilateral, so rotated and skewed cards are found as well as straight ones
+    # The quadrilateral is checked against the rows x cols layout (square patches, card upright) and a ValueError is
+    # raised rather than sampling the wrong region: its height / width has to be within a factor maxAspectError of
+    # rows / cols, and every cell has to be at least minCellSide pixels at full resolution
+    # Returns the 4 corners in full-resolution pixels (float32) ordered top-left, top-right, bottom-right, bottom-left
+    def locate_card(img, detectSide=1024, debug=None, rows=6, cols=4, maxAspectError=1.4, minCellSide=8):
+        scale = min(1.0, detectSide / max(img.shape[:2])) if detectSide else 1.0
+        # Plain bilinear sampling is enough to find a card-sized blob and is far cheaper than INTER_AREA on large images
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR) if scale < 1.0 else img
+
+        blurred = cv2.GaussianBlur(small, (5,5), 0)
         img_hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
-        split = cv2.split(img_hsv)
-        hue = split[0]
-        sat = split[1]
-        val = split[2]
-
-        ret,thresh1 = cv2.threshold(val,60,255, cv2.THRESH_BINARY)
-        ret,thresh2 = cv2.threshold(sat,60,255, cv2.THRESH_BINARY)
-
-        mask = cv2.bitwise_and(thresh1, thresh2)
-
-        # cv2.imshow("HSV",img_hsv)
-        # cv2.imshow("Val", thresh1)
-        # cv2.imshow("Sat", thresh2)
-
-        # cv2.imshow("Both Sat and Val", mask)
-
-        edges = cv2.Canny(mask, 30, 180)
-
-        # Clean small noise (optional)
-        kernel = np.ones((3,3), np.uint8)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        thin_lines = img.copy()
-        cv2.drawContours(thin_lines, contours, -1, (0,255,0), 4)
-
-        # cv2.imshow("Thin Lines", thin_lines)
-        # cv2.imshow("Edges", edges)
-
-        contours, ret = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        largest_contour= max(contours, key = cv2.contourArea)
-        x, y, w, h = cv2.boundingRect(largest_contour)
-
-        cropped_image = mask[y:y+h, x:x+w]
-        cropped_color = img[y:y+h, x:x+w].copy()  # original color crop
-
-        cropped_edges = edges[y:y+h, x:x+w]  # crop edges too
-
-
-        # cv2.imshow("Cropped", cropped_image)
-        # cv2.imshow("Cropped Edges", cropped_edges)
-
-
-        #Using Hough Transform to detect lines of the black grid
-        lines = cv2.HoughLinesP(
-            cropped_edges,
-            rho=1,
-            theta=np.pi/180,
-            threshold=80,        
-            minLineLength=30,   
-            maxLineGap=40
-        )
-
-        grid_vis = img[y:y+h, x:x+w].copy()  # 3-channel BGR
-
-        if lines is not None:
-            for line in lines:
-                x1, y1, x2, y2 = line[0]  
-                x1, y1, x2, y2 = Color.extend_line(x1, y1, x2, y2, length=350)
-                cv2.line(grid_vis, (x1,y1), (x2,y2), (0,0,255), 4)
-
-        # cv2.imshow("Grid Lines", grid_vis)
-
-        cell_h = h // rows
-        cell_w = w // cols
-
-        # Store average colors
-        avg_colors = np.zeros((rows, cols, 3), dtype=np.uint8)
-
-        median_vis = np.zeros_like(grid_vis)
-
-        median_colors = []
-        row_colors = []
-
-
-        for r in range(rows):
-            for c in range(cols):
-                # Compute cell coordinates
-                x_start = c * cell_w
-                y_start = r * cell_h
-                x_end = x_start + cell_w
-                y_end = y_start + cell_h
-                
-                # Crop the cell
-                cell = grid_vis[y_start:y_end, x_start:x_end]
-                
-                # Compute average color
-                avg = cell.mean(axis=(0,1))  # mean over height and width
-                avg_color = avg.astype(np.uint8)
-                avg_colors[r, c] = avg_color
-
-                median_color = np.median(cell.reshape(-1, 3), axis=0)
-                row_colors.append(median_color)
-
-                
-                # Fill the cell in the visualization image
-                grid_vis[y_start:y_end, x_start:x_end] = avg_color
-                median_vis[y_start:y_end, x_start:x_end] = median_color
-
-            
-            median_colors.append(row_colors)
-
-            # Show the averaged image
-        # cv2.imshow("Average Colors per Cell", grid_vis)
-        cv2.imshow("Median Colors per Cell", median_vis)
-
-
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
-        flat_median_colors = [color for row in median_colors for color in row] #Using median colors for better accuracy (to avoid large outliers)
-
-        #print(flat_median_colors)
-
-        # print("Top-left cell median RGB:", flat_median_colors[0])
-
-        # Access bottom-right cell (last one)
-        # print("Bottom-right cell median RGB:", flat_median_colors[-1])
+        # Saturation and value both above 60
+        mask = cv2.inRange(img_hsv, (0, 61, 61), (255, 255, 255))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5,5), np.uint8))
+
+        contours, ret = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        areas = np.array([cv2.contourArea(contour) for contour in contours])
+        if not contours or areas.max() <= 0:
+            raise ValueError("No color card found in the image")
+        # Specks are ignored, anything from a hundredth of the largest blob up can be a patch
+        blobs = [i for i in np.argsort(-areas) if areas[i] >= max(4.0, 0.01 * areas.max())]
+        boxes = np.array([cv2.boundingRect(contours[i]) for i in blobs], dtype=np.float64)
+        sides = np.sqrt(areas[blobs])
+
+        # Groups of nearby blobs, the card is the group with the largest total area
+        group = np.full(len(blobs), -1)
+        for seed in range(len(blobs)):
+            if group[seed] >= 0:
+                continue
+            group[seed] = seed
+            frontier = [seed]
+            while frontier:
+                x, y, w, h = boxes[frontier.pop()]
+                gapX = np.maximum(0.0, np.maximum(boxes[:, 0] - (x + w), x - (boxes[:, 0] + boxes[:, 2])))
+                gapY = np.maximum(0.0, np.maximum(boxes[:, 1] - (y + h), y - (boxes[:, 1] + boxes[:, 3])))
+                near = (group < 0) & (np.hypot(gapX, gapY) <= 0.5 * sides)
+                group[near] = seed
+                frontier.extend(np.flatnonzero(near))
+        groupAreas = np.bincount(group, weights=areas[blobs])
+        members = np.flatnonzero(group == np.argmax(groupAreas))
+        card_contour = cv2.convexHull(np.concatenate([contours[blobs[i]] for i in members]))
+
+        quad = cv2.approxPolyDP(card_contour, 0.02 * cv2.arcLength(card_contour, True), True).reshape(-1, 2)
+        if len(quad) != 4:
+            # Rounded or partly occluded corners, fall back to the smallest rotated rectangle around the card
+            quad = cv2.boxPoints(cv2.minAreaRect(card_contour))
+        corners = Color.order_corners(quad)
+        # Pixel centers of the small image back to full resolution
+        corners = (corners + 0.5) / scale - 0.5
+
+        if debug is not None:
+            debug["mask"] = mask
+            outline = small.copy()
+            cv2.drawContours(outline, contours, -1, (0,255,0), 2)
+            cv2.polylines(outline, [np.round((corners + 0.5) * scale - 0.5).astype(np.int32)], True, (0,0,255), 2)
+            debug["contours"] = outline
+
+        tl, tr, br, bl = corners
+        w = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+        h = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+        if min(w / cols, h / rows) < minCellSide:
+            raise ValueError(f"Color card found is too small ({w:.0f}x{h:.0f} pixels for {rows}x{cols} patches)")
+        aspectError = (h / w) / (rows / cols)
+        if not 1.0 / maxAspectError <= aspectError <= maxAspectError:
+            raise ValueError(f"Color card found ({w:.0f}x{h:.0f} pixels) does not match a {rows}x{cols} patch layout")
+        return corners
+
+    # Orders 4 points top-left, top-right, bottom-right, bottom-left (for cards rotated by less than 45 degrees)
+    def order_corners(points):
+        points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+        total = points.sum(axis=1)
+        diff = points[:, 1] - points[:, 0]
+        return np.array([points[np.argmin(total)], points[np.argmin(diff)], points[np.argmax(total)], points[np.argmax(diff)]], dtype=np.float32)
+
+    # Perspective warp of the card to an upright rectangle, so every grid cell is an axis-aligned block
+    # The card keeps its own resolution up to maxSide pixels on its longest side (0 = no limit); beyond that the cells
+    # already hold far more samples than the statistics need. Only the card area is resampled
+    def warp_card(img, corners, maxSide=0):
+        tl, tr, br, bl = corners
+        w = max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))
+        h = max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))
+        shrink = min(1.0, maxSide / max(w, h)) if maxSide else 1.0
+        w, h = int(round(w * shrink)), int(round(h * shrink))
+        target = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype=np.float32)
+        M = cv2.getPerspectiveTransform(np.asarray(corners, dtype=np.float32), target)
+        return cv2.warpPerspective(img, M, (w, h), flags=cv2.INTER_LINEAR)
+
+    # Headless by default: nothing is displayed and no visualization buffers are allocated
+    # Pass debug to get the intermediate images; it can be a dict (images are stored in it) or a DebugSink (images are written to disk in the background)
+    # The card is localized on a downscaled copy (see locate_card), then warped upright (at most cardSide pixels long)
+    # and split into the rows x cols grid
+    def colorbalance(img, rows=6, cols=4, inset=0.15, debug=None, detectSide=1024, cardSide=1200):
+
+        corners = Color.locate_card(img, detectSide, debug, rows, cols)
+        card = Color.warp_card(img, corners, cardSide)
+
+        # Mean, median and trimmed mean of every cell at once
+        stats = Color.cell_statistics(card, rows, cols, inset)
+        median_colors = stats["median"]
+
+        if debug is not None:
+            h, w = card.shape[:2]
+            cell_h = h // rows
+            cell_w = w // cols
+
+            # The grid the cells are sampled from, straight lines on the upright card
+            grid_vis = card.copy()
+            for r in range(1, rows):
+                cv2.line(grid_vis, (0, r * cell_h), (w - 1, r * cell_h), (0,0,255), 4)
+            for c in range(1, cols):
+                cv2.line(grid_vis, (c * cell_w, 0), (c * cell_w, h - 1), (0,0,255), 4)
+            debug["grid_lines"] = grid_vis
+
+            # Cell-sized blocks of the per-cell colors
+            for name, colors in (("average_colors", stats["mean"]), ("median_colors", median_colors)):
+                vis = np.zeros_like(card)
+                vis[:rows*cell_h, :cols*cell_w] = np.repeat(np.repeat(colors.astype(np.uint8), cell_h, axis=0), cell_w, axis=1)
+                debug[name] = vis
+
+        flat_median_colors = list(median_colors.reshape(-1, 3)) #Using median colors for better accuracy (to avoid large outliers)
         return flat_median_colors #IN BGR FORMAT
     
+    # Color balance over N frames of the same (static) card: the card is localized in the first frame only and the same
+    # corners are reused for every following frame, which then only costs a warp of the card area and the cell statistics
+    # Each frame's per-cell medians are accumulated in a PatchAccumulator, see there for what is returned
+    # frames is any iterable of BGR images (a list, a FrameSource, ...)
+    def colorbalance_frames(frames, rows=6, cols=4, inset=0.15, detectSide=1024, cardSide=1200, confidence=0.95):
+        accumulator = PatchAccumulator(rows, cols)
+        corners = None
+        for img in frames:
+            if corners is None:
+                corners = Color.locate_card(img, detectSide, rows=rows, cols=cols)
+            card = Color.warp_card(img, corners, cardSide)
+            accumulator.add(Color.cell_statistics(card, rows, cols, inset, statistics=("median",))["median"])
+        if accumulator.count == 0:
+            raise ValueError("No frames given")
+        return accumulator.result(confidence)
+
     #Helper functions for color conversions 
     def rgb_to_hsv_tuple(rgb):
         # rgb: tuple (R, G, B) with 0-255
@@ -167,11 +266,96 @@ class Color:
 
         return (h, s, v)
 
+    # Batched rgb_to_hsv_tuple: (N, 3) RGB 0-255 -> (N, 3) int array of (H°, S%, V%) with a single cvtColor call
+    def rgb_to_hsv_array(rgb):
+        color_np = np.clip(np.asarray(rgb, dtype=np.float64), 0, 255).astype(np.uint8).reshape(-1, 1, 3)
+        hsv_np = cv2.cvtColor(color_np, cv2.COLOR_RGB2HSV).reshape(-1, 3).astype(np.int32)
+
+        hsv_np[:, 0] *= 2                       # OpenCV H: 0-179 → 0-358
+        hsv_np[:, 1:] = hsv_np[:, 1:] * 100 // 255
+        return hsv_np
+
     #Helper function to compute color distance (Euclidean) between two RGB colors. This is used to compare measured colors against reference colors. 
-    #I have the CIEDE2000 function implemented in C# but for simplicity and speed Euclidean distance is sufficient for now. I'll include my C# implementation in the repo as well.
+    #CIEDE2000 (and ΔE76/ΔE94) for whole arrays of patches is in colordifference.py, see ColorDifference.patch_distances
     def color_distance(sample_rgb, reference_rgb):
         sample = np.array(sample_rgb, dtype=float)
         reference = np.array(reference_rgb, dtype=float)
         distance = np.linalg.norm(sample - reference)
         return distance
 
+
+# Streaming per-patch statistics over frames, one (rows, cols, 3) array of patch colors at a time, nothing per frame is kept
+# Mean and variance use Welford's update; the median is a stochastic approximation that moves towards each new value by a
+# step shrinking as 1/n (scaled by the running standard deviation), which settles on the median of the values seen
+class PatchAccumulator:
+    def __init__(self, rows, cols, channels=3):
+        self.count = 0
+        self.mean = np.zeros((rows, cols, channels))
+        self._m2 = np.zeros((rows, cols, channels))
+        self.median = np.zeros((rows, cols, channels))
+
+    def add(self, colors):
+        colors = np.asarray(colors, dtype=np.float64)
+        self.count += 1
+        if self.count == 1:
+            self.mean[:] = colors
+            self.median[:] = colors
+            return
+        delta = colors - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (colors - self.mean)
+        # 1.25 * std = sqrt(pi/2) * std is the optimal step size for normally distributed values
+        step = 1.25 * np.maximum(self.std(), 1.0) / self.count
+        self.median += step * np.sign(colors - self.median)
+
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self._m2)
+
+    def std(self):
+        return np.sqrt(self.variance())
+
+    # Half width of the confidence interval of each patch mean (normal approximation, so optimistic for only a few frames)
+    def margin(self, confidence=0.95):
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * self.std() / np.sqrt(max(self.count, 1))
+
+    # Flat lists of BGR values per patch in card order (like colorbalance returns):
+    # {"mean", "median", "std", "ci_low", "ci_high", "frames"}
+    def result(self, confidence=0.95):
+        margin = self.margin(confidence)
+        flat = lambda values: list(values.reshape(-1, values.shape[-1]))
+        return {
+            "mean": flat(self.mean),
+            "median": flat(self.median),
+            "std": flat(self.std()),
+            "ci_low": flat(self.mean - margin),
+            "ci_high": flat(self.mean + margin),
+            "frames": self.count,
+        }
+
+
+# Collects colorbalance debug images and writes them as PNGs on a background thread so analysis never waits on disk I/O
+# Use it like a dict (sink[name] = image), close() (or leaving a with block) waits for the pending writes
+class DebugSink:
+    def __init__(self, directory, prefix=""):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending = []
+
+    def __setitem__(self, name, image):
+        path = os.path.join(self.directory, f"{self.prefix}{name}.png")
+        self._pending.append(self._pool.submit(cv2.imwrite, path, image))
+
+    def close(self):
+        for pending in self._pending:
+            pending.result()
+        self._pending = []
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
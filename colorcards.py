@@ -1,3 +1,8 @@
+import numpy as np
+from functools import cached_property
+from colorbalance import Color
+from colordifference import ColorDifference
+
 class Colorcard:
     def __init__(self, name, colors):
         self.name = name
@@ -5,6 +10,38 @@ class Colorcard:
       
     def get_color_card_name(self) -> str:
         return self.name
+
+    # Array views of the reference patches in card order, each computed once on first use and cached
+    @cached_property
+    def names(self):
+        return list(self.reference_colors)
+
+    @cached_property
+    def rgb(self):
+        return np.array(list(self.reference_colors.values()), dtype=np.uint8)
+
+    @cached_property
+    def linear_rgb(self):
+        return ColorDifference.srgb_to_linear(self.rgb)
+
+    @cached_property
+    def xyz(self):
+        return ColorDifference.linear_to_xyz(self.linear_rgb)
+
+    @cached_property
+    def lab(self):
+        return ColorDifference.xyz_to_lab(self.xyz)
+
+    # (H°, S%, V%) like Color.rgb_to_hsv_tuple
+    @cached_property
+    def hsv(self):
+        return Color.rgb_to_hsv_array(self.rgb)
+
+    # Color difference of every measured patch (N x 3 RGB, card order) against the cached reference Lab values
+    def distances(self, measured_rgb, metric="ciede2000"):
+        if metric == "euclidean":
+            return ColorDifference.patch_distances(measured_rgb, self.rgb, metric)
+        return ColorDifference.lab_distances(ColorDifference.srgb_to_lab(measured_rgb), self.lab, metric)
     
 #Input colors in RGB format read from top-left to bottom-right of the color card
 small24_color_card = Colorcard(
@@ -0,0 +1,179 @@
+import numpy as np
+import cv2
+from colordifference import ColorDifference
+
+# Color correction matrix (CCM) fitted from the patches measured on a card to the card's reference colors
+#
+#   ccm = ColorCorrection.fit(measured_rgb, small24_color_card.rgb, model="3x4")
+#   corrected = ccm.apply(frame)                       # BGR uint8 frame, e.g. from cv2.imread
+#
+# Models (features of an RGB value in 0-1 that are mapped linearly to the corrected RGB):
+#   3x3               r, g, b
+#   3x4               r, g, b, 1                        (adds an offset per channel, e.g. for flare or black level)
+#   root-polynomial   r, g, b, sqrt(rg), sqrt(gb), sqrt(rb)   (Finlayson et al., degree 2, still exposure invariant)
+# space is where the model is fitted: "srgb" (the 0-255 values as measured) or "linear" (linear light)
+#
+# apply has three paths for uint8 frames:
+#   3x3 / 3x4 in srgb       one cv2.transform over the uint8 image (saturating, no float copy of the frame)
+#   3x3 / 3x4 in linear     a 1D cv2.LUT to 16-bit linear light, one cv2.transform on that and a 1D table back to sRGB,
+#                           done in bands of rows so the 16-bit copy stays small; within 0.6 levels of correct_rgb,
+#                           about 20 ms per megapixel on one core
+#   root-polynomial         a precomputed 3D LUT, exact in red and interpolated over a lutSize x lutSize green/blue grid
+#                           (nodes spaced on a square-root scale, so dark values where the curves bend most get more of them),
+#                           looked up with cv2.remap. The LUT holds the model output before clipping and before the conversion
+#                           back to sRGB, both are done after interpolating with a 1D table, so the interpolation never
+#                           crosses the kink at 0 or 255. With lutSize 65 it is within 1 level of correct_rgb in srgb and
+#                           within 3.5 levels (99.9% of pixels within 1) in linear, where cv2.remap's 1/32 step
+#                           coordinates limit it near black; lutSize 127 halves that. It is the slowest path (about 45-50 ms
+#                           per megapixel on one core, run the benchmark below), fine for stills but not for every frame
+#                           of a live stream
+class ColorCorrection:
+
+    models = ("3x3", "3x4", "root-polynomial")
+    spaces = ("srgb", "linear")
+
+    def __init__(self, matrix, model="3x3", space="srgb", lutSize=65):
+        if model not in ColorCorrection.models:
+            raise ValueError(f"Unknown color correction model: {model}")
+        if space not in ColorCorrection.spaces:
+            raise ValueError(f"Unknown color correction space: {space}")
+        # cv2.remap needs the LUT image to be less than 32767 rows high
+        if not 2 <= lutSize <= 127:
+            raise ValueError("lutSize must be between 2 and 127")
+        # (features, 3): corrected RGB = features(RGB) @ matrix
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.model = model
+        self.space = space
+        self.lutSize = lutSize
+        self._lut = None
+        self._linearTables = None
+
+    def features(rgb, model):
+        rgb = np.asarray(rgb, dtype=np.float64)
+        if model == "3x3":
+            return rgb
+        if model == "3x4":
+            return np.concatenate([rgb, np.ones(rgb.shape[:-1] + (1,))], axis=-1)
+        clipped = np.maximum(rgb, 0.0)
+        r, g, b = clipped[..., 0], clipped[..., 1], clipped[..., 2]
+        roots = np.stack([np.sqrt(r * g), np.sqrt(g * b), np.sqrt(r * b)], axis=-1)
+        return np.concatenate([rgb, roots], axis=-1)
+
+    # 0-255 sRGB -> values in 0-1 in the fitting space, and back
+    def _to_space(rgb, space):
+        rgb = np.asarray(rgb, dtype=np.float64)
+        return ColorDifference.srgb_to_linear(rgb) if space == "linear" else rgb / 255.0
+
+    def _from_space(values, space):
+        return ColorDifference.linear_to_srgb(values) if space == "linear" else values * 255.0
+
+    # Least squares fit of measured (N, 3) RGB 0-255 patches to reference (N, 3) RGB 0-255 patches, both in card order
+    def fit(measured_rgb, reference_rgb, model="3x3", space="srgb", lutSize=65):
+        if model not in ColorCorrection.models:
+            raise ValueError(f"Unknown color correction model: {model}")
+        source = ColorCorrection.features(ColorCorrection._to_space(measured_rgb, space), model)
+        target = ColorCorrection._to_space(reference_rgb, space)
+        if len(source) < source.shape[1]:
+            raise ValueError(f"The {model} model needs at least {source.shape[1]} patches")
+        matrix, _, _, _ = np.linalg.lstsq(source, target, rcond=None)
+        return ColorCorrection(matrix, model, space, lutSize)
+
+    # Exact correction of RGB 0-255 values of any shape (..., 3), e.g. the measured patches, clipped to 0-255
+    def correct_rgb(self, rgb):
+        corrected = ColorCorrection.features(ColorCorrection._to_space(rgb, self.space), self.model) @ self.matrix
+        return np.clip(ColorCorrection._from_space(corrected, self.space), 0.0, 255.0)
+
+    # Color difference of every patch against the card before and after correction, as (before, after) arrays
+    def delta_e(self, measured_rgb, color_card, metric="ciede2000"):
+        return color_card.distances(measured_rgb, metric), color_card.distances(self.correct_rgb(measured_rgb), metric)
+
+    # The matrix as cv2.transform wants it for BGR images (3x3 or 3x4, offset in units of scale, 255 for uint8 values)
+    def bgr_matrix(self, scale=255.0):
+        if self.model == "root-polynomial":
+            raise ValueError("The root-polynomial model has no matrix form, use the LUT")
+        transform = self.matrix.T[::-1].copy()
+        transform[:, :3] = transform[:, 2::-1]
+        if self.model == "3x4":
+            transform[:, 3] *= scale
+        return transform.astype(np.float32)
+
+    # 1D tables for the linear matrix path: uint8 sRGB -> uint16 linear light (0-65535) and uint16 linear light -> uint8 sRGB
+    def linear_tables(self):
+        if self._linearTables is None:
+            toLinear = np.round(ColorDifference.srgb_to_linear(np.arange(256.0)) * 65535.0).astype(np.uint16)
+            toSrgb = np.round(np.clip(ColorDifference.linear_to_srgb(np.arange(65536.0) / 65535.0), 0.0, 255.0)).astype(np.uint8)
+            self._linearTables = (toLinear, toSrgb)
+        return self._linearTables
+
+    # 3D LUT as a (256 * lutSize, lutSize, 3) BGR uint16 image: row red * lutSize + green node, column blue node, holding
+    # the unclipped model output u (0-1 in the fitting space, -2 to 2 kept) as 32768 + 16383 u,
+    # the (1, 256, 3) float table that turns BGR pixel values into those LUT coordinates
+    # and the 65536 entry uint8 table that clips an interpolated LUT value and converts it to sRGB. Built once on first use
+    def lut(self):
+        if self._lut is None:
+            nodes = 255.0 * np.linspace(0.0, 1.0, self.lutSize) ** 2
+            red, green, blue = np.meshgrid(np.arange(256.0), nodes, nodes, indexing="ij")
+            output = ColorCorrection.features(ColorCorrection._to_space(np.stack([red, green, blue], axis=-1), self.space), self.model) @ self.matrix
+            table = np.round(32768.0 + 16383.0 * np.clip(output[..., ::-1], -2.0, 2.0)).astype(np.uint16)
+            table = table.reshape(256 * self.lutSize, self.lutSize, 3)
+            node = (self.lutSize - 1) * np.sqrt(np.arange(256.0) / 255.0)
+            coordinates = np.stack([node, node, np.arange(256.0) * self.lutSize], axis=-1).reshape(1, 256, 3).astype(np.float32)
+            toSrgb = ColorCorrection._from_space(np.clip((np.arange(65536.0) - 32768.0) / 16383.0, 0.0, 1.0), self.space)
+            toSrgb = np.round(np.clip(toSrgb, 0.0, 255.0)).astype(np.uint8)
+            self._lut = (table, coordinates, toSrgb)
+        return self._lut
+
+    # Corrects a BGR uint8 image, returns a new BGR uint8 image
+    def apply(self, img):
+        if self.model != "root-polynomial" and self.space == "srgb":
+            return cv2.transform(img, self.bgr_matrix())
+        if self.model != "root-polynomial":
+            toLinear, toSrgb = self.linear_tables()
+            matrix = self.bgr_matrix(65535.0)
+            corrected = np.empty_like(img)
+            # cv2.transform on uint16 rounds and saturates, so out of range values clip like correct_rgb does
+            for y in range(0, img.shape[0], 64):
+                corrected[y:y + 64] = toSrgb[cv2.transform(cv2.LUT(img[y:y + 64], toLinear), matrix)]
+            return corrected
+        table, coordinates, toSrgb = self.lut()
+        # Done in bands of rows, which keeps the float coordinates and 16-bit copies small (and cv2.remap handles at
+        # most 32766 rows at a time)
+        corrected = np.empty_like(img)
+        for y in range(0, img.shape[0], 256):
+            band = img[y:y + 256]
+            # LUT coordinates per channel from the pixel values, then x = blue node, y = red row block + green node
+            bandCoordinates = cv2.transform(cv2.LUT(band, coordinates), np.array([[1, 0, 0], [0, 1, 1]], dtype=np.float32))
+            corrected[y:y + 256] = toSrgb[cv2.remap(table, bandCoordinates, None, cv2.INTER_LINEAR)]
+        return corrected
+
+
+# Fits every model to a simulated camera response of the 24 patch card and times apply on a 20 MP frame
+# Run with: python colorcorrection.py --benchmark
+def benchmark(height=4000, width=5000, repeats=3):
+    import time
+    from colorcards import small24_color_card
+
+    # A camera that mixes the channels and lifts the blacks a little
+    mixing = np.array([[0.85, 0.12, 0.03], [0.08, 0.80, 0.12], [0.02, 0.15, 0.83]])
+    camera = lambda rgb: np.clip(ColorDifference.linear_to_srgb(ColorDifference.srgb_to_linear(rgb) @ mixing.T * 0.9 + 0.01), 0, 255)
+    reference = small24_color_card.rgb.astype(np.float64)
+    measured = camera(reference)
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    print(f"{len(reference)} patches, mean ΔE2000 before / after correction, apply time at {width}x{height}")
+    for model in ColorCorrection.models:
+        for space in ColorCorrection.spaces:
+            ccm = ColorCorrection.fit(measured, reference, model, space)
+            before, after = ccm.delta_e(measured, small24_color_card)
+            ccm.apply(frame[:8, :8])
+            start = time.perf_counter()
+            for _ in range(repeats):
+                ccm.apply(frame)
+            seconds = (time.perf_counter() - start) / repeats
+            print(f"{model:<16} {space:<7} {before.mean():6.2f} -> {after.mean():5.2f}   {seconds*1e3:7.1f} ms")
+
+
+if __name__ == '__main__':
+    import sys
+    if '--benchmark' in sys.argv:
+        benchmark()
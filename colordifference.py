@@ -0,0 +1,151 @@
+import numpy as np
+
+# Vectorized sRGB -> CIELAB conversion and color difference formulas (ΔE76, ΔE94, CIEDE2000)
+# Every function takes arrays of shape (..., 3) so a whole card of patches is scored in one call
+# Python counterpart of CIEDE2000-Color-Difference.cs (D65 white point, kL = kC = kH = 1)
+class ColorDifference:
+
+    # sRGB (D65) -> XYZ matrix and reference white
+    RGB_TO_XYZ = np.array([
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ])
+    WHITE_D65 = np.array([0.95047, 1.00000, 1.08883])
+
+    # 0-255 sRGB -> linear RGB in 0-1
+    def srgb_to_linear(rgb):
+        c = np.asarray(rgb, dtype=np.float64) / 255.0
+        return np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+
+    # Linear RGB in 0-1 -> 0-255 sRGB (float, not clipped)
+    def linear_to_srgb(linear_rgb):
+        c = np.asarray(linear_rgb, dtype=np.float64)
+        return 255.0 * np.where(c > 0.0031308, 1.055 * np.abs(c) ** (1.0 / 2.4) - 0.055, c * 12.92)
+
+    def linear_to_xyz(linear_rgb):
+        return np.asarray(linear_rgb, dtype=np.float64) @ ColorDifference.RGB_TO_XYZ.T
+
+    def xyz_to_lab(xyz):
+        t = np.asarray(xyz, dtype=np.float64) / ColorDifference.WHITE_D65
+        delta = 6.0 / 29.0
+        f = np.where(t > delta ** 3, np.cbrt(t), t / (3 * delta ** 2) + 4.0 / 29.0)
+        L = 116.0 * f[..., 1] - 16.0
+        a = 500.0 * (f[..., 0] - f[..., 1])
+        b = 200.0 * (f[..., 1] - f[..., 2])
+        return np.stack([L, a, b], axis=-1)
+
+    # 0-255 sRGB (R, G, B order) -> CIELAB
+    def srgb_to_lab(rgb):
+        return ColorDifference.xyz_to_lab(ColorDifference.linear_to_xyz(ColorDifference.srgb_to_linear(rgb)))
+
+    def delta_e76(lab1, lab2):
+        return np.linalg.norm(np.asarray(lab1, dtype=np.float64) - np.asarray(lab2, dtype=np.float64), axis=-1)
+
+    # CIE94 with graphic arts weights, lab2 is the reference
+    def delta_e94(lab1, lab2, kL=1.0, K1=0.045, K2=0.015):
+        lab1 = np.asarray(lab1, dtype=np.float64)
+        lab2 = np.asarray(lab2, dtype=np.float64)
+        dL = lab1[..., 0] - lab2[..., 0]
+        C1 = np.hypot(lab1[..., 1], lab1[..., 2])
+        C2 = np.hypot(lab2[..., 1], lab2[..., 2])
+        dC = C1 - C2
+        da = lab1[..., 1] - lab2[..., 1]
+        db = lab1[..., 2] - lab2[..., 2]
+        dH2 = np.maximum(da * da + db * db - dC * dC, 0.0)
+        SC = 1.0 + K1 * C2
+        SH = 1.0 + K2 * C2
+        return np.sqrt((dL / kL) ** 2 + (dC / SC) ** 2 + dH2 / SH ** 2)
+
+    # CIEDE2000, following Sharma, Wu & Dalal, "The CIEDE2000 Color-Difference Formula: Implementation Notes"
+    def delta_e2000(lab1, lab2, kL=1.0, kC=1.0, kH=1.0):
+        lab1 = np.asarray(lab1, dtype=np.float64)
+        lab2 = np.asarray(lab2, dtype=np.float64)
+        L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+        L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+        C_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2.0
+        G = 0.5 * (1.0 - np.sqrt(C_mean ** 7 / (C_mean ** 7 + 25.0 ** 7)))
+        a1p = (1.0 + G) * a1
+        a2p = (1.0 + G) * a2
+        C1p = np.hypot(a1p, b1)
+        C2p = np.hypot(a2p, b2)
+        h1p = np.mod(np.arctan2(b1, a1p), 2 * np.pi)
+        h2p = np.mod(np.arctan2(b2, a2p), 2 * np.pi)
+
+        dLp = L2 - L1
+        dCp = C2p - C1p
+        chroma_zero = C1p * C2p == 0
+        dhp = h2p - h1p
+        dhp = np.where(dhp > np.pi, dhp - 2 * np.pi, dhp)
+        dhp = np.where(dhp < -np.pi, dhp + 2 * np.pi, dhp)
+        dhp = np.where(chroma_zero, 0.0, dhp)
+        dHp = 2.0 * np.sqrt(C1p * C2p) * np.sin(dhp / 2.0)
+
+        Lp_mean = (L1 + L2) / 2.0
+        Cp_mean = (C1p + C2p) / 2.0
+        hp_sum = h1p + h2p
+        hp_mean = np.where(np.abs(h1p - h2p) <= np.pi, hp_sum / 2.0,
+                           np.where(hp_sum < 2 * np.pi, (hp_sum + 2 * np.pi) / 2.0, (hp_sum - 2 * np.pi) / 2.0))
+        hp_mean = np.where(chroma_zero, hp_sum, hp_mean)
+
+        T = (1.0 - 0.17 * np.cos(hp_mean - np.pi / 6.0) + 0.24 * np.cos(2.0 * hp_mean)
+             + 0.32 * np.cos(3.0 * hp_mean + np.pi / 30.0) - 0.20 * np.cos(4.0 * hp_mean - 63.0 * np.pi / 180.0))
+        d_theta = np.pi / 6.0 * np.exp(-(((np.degrees(hp_mean) - 275.0) / 25.0) ** 2))
+        RC = 2.0 * np.sqrt(Cp_mean ** 7 / (Cp_mean ** 7 + 25.0 ** 7))
+        SL = 1.0 + 0.015 * (Lp_mean - 50.0) ** 2 / np.sqrt(20.0 + (Lp_mean - 50.0) ** 2)
+        SC = 1.0 + 0.045 * Cp_mean
+        SH = 1.0 + 0.015 * Cp_mean * T
+        RT = -np.sin(2.0 * d_theta) * RC
+
+        return np.sqrt((dLp / (kL * SL)) ** 2 + (dCp / (kC * SC)) ** 2 + (dHp / (kH * SH)) ** 2
+                       + RT * (dCp / (kC * SC)) * (dHp / (kH * SH)))
+
+    # Scores measured Lab values against reference Lab values (both (..., 3)), metric is "ciede2000", "cie94" or "cie76"
+    def lab_distances(measured_lab, reference_lab, metric="ciede2000"):
+        formulas = {
+            "ciede2000": ColorDifference.delta_e2000,
+            "cie94": ColorDifference.delta_e94,
+            "cie76": ColorDifference.delta_e76,
+        }
+        if metric not in formulas:
+            raise ValueError(f"Unknown color difference metric: {metric}")
+        return formulas[metric](measured_lab, reference_lab)
+
+    # Scores every measured patch against its reference in one call
+    # measured_rgb and reference_rgb are (N, 3) arrays of 0-255 sRGB, metric is "ciede2000", "cie94", "cie76" or "euclidean" (plain RGB distance)
+    def patch_distances(measured_rgb, reference_rgb, metric="ciede2000"):
+        if metric == "euclidean":
+            return np.linalg.norm(np.asarray(measured_rgb, dtype=np.float64) - np.asarray(reference_rgb, dtype=np.float64), axis=-1)
+        return ColorDifference.lab_distances(ColorDifference.srgb_to_lab(measured_rgb), ColorDifference.srgb_to_lab(reference_rgb), metric)
+
+# Times the per-patch Euclidean loop report.py used against the batched scores of the 24 patch card, both
+# Colorcard.distances (cached reference Lab, what report.py calls) and patch_distances (converts both sides every call)
+# Run with: python colordifference.py --benchmark
+def benchmark(repeats=2000):
+    import timeit
+    from colorbalance import Color
+    from colorcards import small24_color_card
+
+    reference = small24_color_card.rgb.astype(np.float64)
+    measured = np.clip(reference + np.random.default_rng(0).normal(0.0, 8.0, reference.shape), 0, 255)
+    small24_color_card.lab  # builds the cached reference Lab before timing
+
+    def euclidean_loop():
+        return [Color.color_distance(m, r) for m, r in zip(measured, reference)]
+
+    runs = [("euclidean per patch", euclidean_loop)]
+    for metric in ("euclidean", "cie76", "cie94", "ciede2000"):
+        runs.append((f"{metric} card", lambda metric=metric: small24_color_card.distances(measured, metric)))
+    for metric in ("cie76", "ciede2000"):
+        runs.append((f"{metric} patch_distances", lambda metric=metric: ColorDifference.patch_distances(measured, reference, metric)))
+
+    print(f"{len(reference)} patches, mean of {repeats} runs")
+    for name, run in runs:
+        seconds = timeit.timeit(run, number=repeats) / repeats
+        print(f"{name:<26} {seconds*1e6:8.1f} us")
+
+if __name__ == '__main__':
+    import sys
+    if '--benchmark' in sys.argv:
+        benchmark()
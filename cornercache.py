@@ -0,0 +1,99 @@
+import hashlib
+import os
+import numpy as np
+
+#Directory of .npz entries, one file per key, shared by the corner cache and the undistortion map cache (undistort.py)
+#Subclasses build the key and decide what an entry holds, this class reads and writes entries and keeps the directory under maxBytes
+#Least recently used entries are removed once the cache grows past maxBytes
+class NpzCache:
+    def __init__(self, cacheDir, maxBytes):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        os.makedirs(cacheDir, exist_ok=True)
+
+    def _entryPath(self, key):
+        return os.path.join(self.cacheDir, key + ".npz")
+
+    #Returns read(entry) for the opened entry, or None on a miss or an unreadable entry
+    def _read(self, key, read):
+        entryPath = self._entryPath(key)
+        try:
+            with np.load(entryPath) as entry:
+                value = read(entry)
+        except (OSError, KeyError, ValueError):
+            return None
+        #Touch the entry so eviction treats it as recently used
+        os.utime(entryPath)
+        return value
+
+    def _write(self, key, compressed, **arrays):
+        tmpPath = self._entryPath(key) + ".tmp.npz"
+        (np.savez_compressed if compressed else np.savez)(tmpPath, **arrays)
+        #Rename so readers in other processes never see a half written entry
+        os.replace(tmpPath, self._entryPath(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cacheDir):
+            if not name.endswith(".npz") or name.endswith(".tmp.npz"):
+                continue
+            entryPath = os.path.join(self.cacheDir, name)
+            try:
+                stat = os.stat(entryPath)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entryPath))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, entryPath in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(entryPath)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cacheDir):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.cacheDir, name))
+
+
+#On-disk cache of detected chessboard corners, one .npz file per image
+#Entries are keyed by the image file contents plus the detection settings, so an edited image or a changed board size is a miss
+class CornerCache(NpzCache):
+    def __init__(self, cacheDir=".cornercache", maxBytes=64 * 1024 * 1024):
+        super().__init__(cacheDir, maxBytes)
+
+    #Hashes the file in chunks so large TIFFs are never held in memory just for the key
+    def key(self, imgPath, params):
+        digest = hashlib.sha256()
+        with open(imgPath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(repr(params).encode())
+        return digest.hexdigest()
+
+    #Returns (corners or None if the board was not found, image size, ids), or None on a miss
+    #ids are the point ids of a partial detection (see targets.py), None when the whole board was found
+    def get(self, key):
+        def read(entry):
+            found = bool(entry["found"])
+            corners = entry["corners"] if found else None
+            imageSize = tuple(int(v) for v in entry["imageSize"])
+            #Entries written before partial detections existed have no ids
+            ids = entry["ids"] if found and "ids" in entry.files and entry["ids"].size else None
+            return corners, imageSize, ids
+        return self._read(key, read)
+
+    def put(self, key, corners, imageSize, ids=None):
+        found = corners is not None
+        self._write(key, True,
+                    found=np.array(found),
+                    corners=corners if found else np.zeros((0, 1, 2), np.float32),
+                    imageSize=np.array(imageSize, np.int32),
+                    ids=np.asarray(ids, np.int32) if ids is not None else np.zeros(0, np.int32))
@@ -1,58 +1,337 @@
 import numpy as np
 import cv2
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+#Scratch buffers for Focus.computeAll, kept per thread so computeBatch workers never share them
+_scratch = threading.local()
+
 class Focus:
     def __init__(self):
         return None
     #https://opencv.org/blog/autofocus-using-opencv-a-comparative-study-of-focus-measures-for-sharpness-assessment/
 
-    
+    #Names accepted by computeAll/computeBatch and the threshold each measure is judged against
+    methods = ("laplacian", "localVariance", "tenengrad", "brenner", "sobelVariance")
+    thresholds = {
+        "laplacian": 10000,
+        "localVariance": 200,
+        "tenengrad": 100,
+        "brenner": 5000,
+        "sobelVariance": 150000.0,
+    }
+
+    #Largest scratch array (bytes) that is kept between calls, e.g. a float32 plane of a 64 MP frame
+    #Bigger ones (huge stitched images) are allocated per call and freed on return instead of staying alive with the thread
+    maxScratchBytes = 256 * 1024 * 1024
+
+    #Returns a per-thread scratch array, reused across calls so repeated measurements do not reallocate full frames
+    def _buffer(name, shape, dtype):
+        buffers = _scratch.__dict__.setdefault("buffers", {})
+        buf = buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buffers.pop(name, None)
+            buf = np.empty(shape, dtype)
+            if buf.nbytes <= Focus.maxScratchBytes:
+                buffers[name] = buf
+        return buf
+
+    #Bytes held by the calling thread's scratch buffers (one uint8 and two float32 frames after computeAll on a color frame)
+    def scratchBytes():
+        return sum(buf.nbytes for buf in _scratch.__dict__.get("buffers", {}).values())
+
+    #Frees the calling thread's scratch buffers, e.g. once a run of measurements on large frames is over
+    def releaseBuffers():
+        _scratch.__dict__.pop("buffers", None)
+
+    #Computes the selected focus measures (all of them by default) in one call and returns {method: focusValue}
+    #The grayscale conversion and the Sobel gradients are done once and shared by every measure that needs them
+    #Everything runs on uint8 input with float32 scratch buffers and OpenCV reductions, so no full-frame float64 copies are made
+    def computeAll(img, methods=None):
+        if methods is None:
+            methods = Focus.methods
+        unknown = set(methods) - set(Focus.methods)
+        if unknown:
+            raise ValueError(f"Unknown focus method(s): {sorted(unknown)}")
+
+        shape = img.shape[:2]
+        if img.ndim == 2:
+            imgGray = img
+        else:
+            imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=Focus._buffer("gray", shape, np.uint8))
+        results = {}
+
+        if "laplacian" in methods:
+            laplacian = cv2.Laplacian(imgGray, cv2.CV_32F, dst=Focus._buffer("a", shape, np.float32))
+            mean, std = cv2.meanStdDev(laplacian)
+            results["laplacian"] = float(std[0, 0]) ** 2
+
+        if "localVariance" in methods:
+            ksize=5
+            #Box filters straight from uint8 into float32, sqrBoxFilter averages the squares without materialising imgGray**2
+            mean = cv2.boxFilter(imgGray, cv2.CV_32F, (ksize, ksize), dst=Focus._buffer("a", shape, np.float32))
+            squared_mean = cv2.sqrBoxFilter(imgGray, cv2.CV_32F, (ksize, ksize), dst=Focus._buffer("b", shape, np.float32))
+            cv2.multiply(mean, mean, dst=mean)
+            variance = cv2.subtract(squared_mean, mean, dst=squared_mean)
+            results["localVariance"] = cv2.mean(variance)[0]
+
+        if "tenengrad" in methods or "sobelVariance" in methods:
+            sobel_x=cv2.Sobel(imgGray, cv2.CV_32F, 1, 0, dst=Focus._buffer("a", shape, np.float32), ksize=3)#Sobel x gradient
+            sobel_y=cv2.Sobel(imgGray, cv2.CV_32F, 0, 1, dst=Focus._buffer("b", shape, np.float32), ksize=3)#Sobel y gradient
+            sobel_magnitude = cv2.magnitude(sobel_x, sobel_y, sobel_x)
+            meanMagnitude = cv2.mean(sobel_magnitude)[0]
+            if "tenengrad" in methods:
+                results["tenengrad"] = meanMagnitude
+            if "sobelVariance" in methods:
+                mean, std = cv2.meanStdDev(imgGray)
+                results["sobelVariance"] = round(meanMagnitude + float(std[0, 0]) ** 2, 2)
+
+        if "brenner" in methods:
+            #Sum of squared differences between pixels 2 apart horizontally, accumulated in double by OpenCV
+            results["brenner"] = cv2.norm(imgGray[:, 2:], imgGray[:, :-2], cv2.NORM_L2SQR)
+
+        return results
+
+    #computeAll over a batch of images (a list or an (N, H, W[, 3]) array), one pass per frame
+    #OpenCV releases the GIL, so frames are spread over a thread pool, results come back in input order
+    def computeBatch(imgs, methods=None, workers=None):
+        if workers == 1:
+            return [Focus.computeAll(img, methods) for img in imgs]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda img: Focus.computeAll(img, methods), imgs))
+
+    #Sobel Variance focus value of every tileSize x tileSize tile, returned as a (tileRows, tileCols) float32 grid
+    #Low values point at soft regions of the field of view (e.g. the corners of a stitched image)
+    #Only one tile (plus a 1 pixel halo for the Sobel kernel) is converted at a time, in float32, so memory does not grow with the image
+    #workers > 1 processes tiles on a thread pool, which helps on very large line-scan images
+    def computeFocusMap(img, tileSize=512, workers=1):
+        height, width = img.shape[:2]
+        tileRows = (height + tileSize - 1) // tileSize
+        tileCols = (width + tileSize - 1) // tileSize
+
+        def tileFocus(index):
+            r, c = divmod(index, tileCols)
+            y0, x0 = r * tileSize, c * tileSize
+            y1, x1 = min(y0 + tileSize, height), min(x0 + tileSize, width)
+            #Neighbouring pixels make the gradients on the tile edge match the full frame gradients
+            hy0, hx0 = max(y0 - 1, 0), max(x0 - 1, 0)
+            hy1, hx1 = min(y1 + 1, height), min(x1 + 1, width)
+
+            tile = img[hy0:hy1, hx0:hx1]
+            tileGray = tile if tile.ndim == 2 else cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+            sobel_x = cv2.Sobel(tileGray, cv2.CV_32F, 1, 0, ksize=3)
+            sobel_y = cv2.Sobel(tileGray, cv2.CV_32F, 0, 1, ksize=3)
+            sobel_magnitude = cv2.magnitude(sobel_x, sobel_y)
+
+            inner = (slice(y0 - hy0, y1 - hy0), slice(x0 - hx0, x1 - hx0))
+            meanMagnitude = cv2.mean(sobel_magnitude[inner])[0]
+            mean, std = cv2.meanStdDev(tileGray[inner])
+            return meanMagnitude + float(std[0, 0]) ** 2
+
+        indices = range(tileRows * tileCols)
+        if workers == 1:
+            values = [tileFocus(i) for i in indices]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                values = list(pool.map(tileFocus, indices))
+        return np.array(values, dtype=np.float32).reshape(tileRows, tileCols)
+
+    #Sobel Variance of a TiledImage computed strip by strip, so memory stays constant however large the image is
+    #Each strip carries one extra row above and below so the gradients match the full image exactly
+    def computeSobelVarianceTiled(image, stripRows=512):
+        magnitudeSum = 0.0
+        graySum = 0.0
+        graySquaredSum = 0.0
+        count = 0
+        for y0, y1, strip in image.strips(stripRows, halo=1):
+            stripGray = strip if strip.ndim == 2 else cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY)
+            top = y0 - max(y0 - 1, 0)
+            inner = slice(top, top + (y1 - y0))
+            sobel_x = cv2.Sobel(stripGray, cv2.CV_32F, 1, 0, ksize=3)
+            sobel_y = cv2.Sobel(stripGray, cv2.CV_32F, 0, 1, ksize=3)
+            sobel_magnitude = cv2.magnitude(sobel_x, sobel_y)
+
+            magnitudeSum += cv2.sumElems(sobel_magnitude[inner])[0]
+            rowsGray = stripGray[inner]
+            graySum += cv2.sumElems(rowsGray)[0]
+            graySquaredSum += cv2.norm(rowsGray, cv2.NORM_L2SQR)
+            count += rowsGray.size
+
+        mean = graySum / count
+        variance = graySquaredSum / count - mean ** 2
+        return round(magnitudeSum / count + variance, 2)
 
     #Implement all of the options to see which one produces the best results, Sobel Variance seems to be the most reliable
     #All have pros and cons considering environment
     def computeLaplacian(img):
-        imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        laplacian = cv2.Laplacian(imgGray, cv2.CV_64F)
-        focusValue= np.var(laplacian)
-        focusThreshold= 10000
+        focusValue= Focus.computeAll(img, ("laplacian",))["laplacian"]
+        focusThreshold= Focus.thresholds["laplacian"]
         return focusValue, focusThreshold
 
     def computeLocalVariance(img):
-        imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        ksize=5
-        mean = cv2.blur(imgGray, (ksize, ksize))
-        squared_mean = cv2.blur(imgGray**2, (ksize, ksize))
-        variance = squared_mean - (mean**2)
-        focusValue= np.mean(variance)
-        focusThreshold= 200
+        focusValue= Focus.computeAll(img, ("localVariance",))["localVariance"]
+        focusThreshold= Focus.thresholds["localVariance"]
         return focusValue, focusThreshold
 
 
     def computeTenengrad(img):
-        imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        sobel_x=cv2.Sobel(imgGray, cv2.CV_64F, 1, 0, ksize=3)#Sobel x gradient
-        sobel_y=cv2.Sobel(imgGray, cv2.CV_64F, 0, 1, ksize=3)#Sobel y gradient
-        tenengrad = np.sqrt(sobel_x**2+sobel_y**2)
-        focusValue= np.mean(tenengrad)
-        focusThreshold=100
+        focusValue= Focus.computeAll(img, ("tenengrad",))["tenengrad"]
+        focusThreshold=Focus.thresholds["tenengrad"]
         return focusValue, focusThreshold
 
     def computeBrenner(img):
-        imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        shifted = np.roll(imgGray, -2, axis=1)  # Shift by 2 pixels horizontally
-        diff = (imgGray - shifted) ** 2
-        focusValue= np.sum(diff)
-        focusThreshold=5000
+        focusValue= Focus.computeAll(img, ("brenner",))["brenner"]
+        focusThreshold=Focus.thresholds["brenner"]
         return focusValue, focusThreshold
 
     def computeSobelVarianceCombo(img):
-        imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        sobel_x=cv2.Sobel(imgGray, cv2.CV_64F, 1, 0, ksize=3)#Sobel x gradient
-        sobel_y=cv2.Sobel(imgGray, cv2.CV_64F, 0, 1, ksize=3)#Sobel y gradient
-        sobel_magnitude = np.sqrt(sobel_x**2+sobel_y**2)
-        variance = np.var(imgGray)
-
-        focusValue= round(np.mean(sobel_magnitude) + variance, 2)
+        focusValue= Focus.computeAll(img, ("sobelVariance",))["sobelVariance"]
         print("Sobel Variance Focus Value:", focusValue)
         return focusValue
+
+
+
+#Real-time focus feedback while a lens is focused by hand
+#Only a region of interest is scored (the central third of the frame by default), optionally decimated first, so each
+#update costs a small fraction of a full frame. Scores are smoothed over time and a peak is held so the operator can
+#turn the lens past best focus and come back to it. update() does no I/O and returns a plain dict
+class FocusAssist:
+    #roi is (x, y, w, h) in full frame pixels, decimation shrinks the ROI by that factor before scoring
+    #smoothing is the weight of the newest score in the running average (1 = no smoothing)
+    #holdFrames is how many frames the peak is held before it follows the current score down again
+    def __init__(self, roi=None, decimation=1, smoothing=0.3, holdFrames=30):
+        self.roi = roi
+        self.decimation = decimation
+        self.smoothing = smoothing
+        self.holdFrames = holdFrames
+        self.reset()
+
+    def reset(self):
+        self.smoothed = None
+        self.peak = None
+        self.framesSincePeak = 0
+
+    def _region(self, frame):
+        height, width = frame.shape[:2]
+        if self.roi is None:
+            x, y, w, h = width // 3, height // 3, width // 3, height // 3
+        else:
+            x, y, w, h = self.roi
+        region = frame[max(y, 0):min(y + h, height), max(x, 0):min(x + w, width)]
+        if self.decimation > 1:
+            region = cv2.resize(region, None, fx=1.0/self.decimation, fy=1.0/self.decimation, interpolation=cv2.INTER_AREA)
+        return region
+
+    def update(self, frame):
+        score = Focus.computeAll(self._region(frame), ("sobelVariance",))["sobelVariance"]
+
+        if self.smoothed is None:
+            self.smoothed = score
+        else:
+            self.smoothed = self.smoothing * score + (1.0 - self.smoothing) * self.smoothed
+
+        if self.peak is None or self.smoothed >= self.peak:
+            self.peak = self.smoothed
+            self.framesSincePeak = 0
+        else:
+            self.framesSincePeak += 1
+            if self.framesSincePeak > self.holdFrames:
+                #Hold expired, release the peak to the current score
+                self.peak = self.smoothed
+                self.framesSincePeak = 0
+
+        return {
+            "score": score,
+            "smoothed": self.smoothed,
+            "peak": self.peak,
+            #1.0 at the held peak, how close the lens is to the best focus seen so far
+            "peakFraction": self.smoothed / self.peak if self.peak else 0.0,
+        }
+
+#The focus measures as they were before computeAll (float64 temporaries, Local Variance and Brenner wrapping around in
+#uint8), kept for the benchmark below
+def _originalMeasures(img):
+    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    np.var(cv2.Laplacian(imgGray, cv2.CV_64F))
+
+    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    np.mean(cv2.blur(imgGray**2, (5, 5)) - (cv2.blur(imgGray, (5, 5))**2))
+
+    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    sobel_x = cv2.Sobel(imgGray, cv2.CV_64F, 1, 0, ksize=3)
+    sobel_y = cv2.Sobel(imgGray, cv2.CV_64F, 0, 1, ksize=3)
+    np.mean(np.sqrt(sobel_x**2 + sobel_y**2))
+    del sobel_x, sobel_y
+
+    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    np.sum((imgGray - np.roll(imgGray, -2, axis=1)) ** 2)
+
+    imgGray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    sobel_x = cv2.Sobel(imgGray, cv2.CV_64F, 1, 0, ksize=3)
+    sobel_y = cv2.Sobel(imgGray, cv2.CV_64F, 0, 1, ksize=3)
+    round(np.mean(np.sqrt(sobel_x**2 + sobel_y**2)) + np.var(imgGray), 2)
+
+#Peak resident memory of this process in bytes (ru_maxrss is in KiB on Linux and in bytes on macOS)
+def _peakRss():
+    import resource
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+#One case of the benchmark, run in a fresh process so the peak resident memory belongs to that case alone
+#The frame is generated in place, so the peak before the first call is the process plus the frame
+def _benchmarkCase(name, width, height, repeats):
+    img = np.empty((height, width, 3), np.uint8)
+    cv2.randu(img, 0, 256)
+    measure = _originalMeasures if name == "original" else Focus.computeAll
+    baseline = _peakRss()
+    seconds = []
+    for _ in range(repeats + 1):
+        start = time.perf_counter()
+        measure(img)
+        seconds.append(time.perf_counter() - start)
+    #The first call is the warm-up (scratch buffers are allocated there), it still counts for the peak
+    peak = (_peakRss() - baseline) / 2**20
+    print(f"{name:<16} {min(seconds[1:])*1000:8.1f} ms  peak RSS +{peak:7.1f} MiB  scratch kept {Focus.scratchBytes()/2**20:7.1f} MiB")
+
+#Compares the original focus measures with Focus.computeAll on a synthetic multi-megapixel capture
+#Prints the best time, the growth of the peak resident memory over the frame itself (which includes OpenCV's own
+#allocations) and what computeAll keeps in its per-thread scratch buffers afterwards. Run with: python focus.py --benchmark
+def benchmark(width=5472, height=3648, repeats=3):
+    import subprocess
+    import sys
+    print(f"{width}x{height} ({width*height/1e6:.1f} MP), best of {repeats}")
+    for name in ("original", "computeAll"):
+        subprocess.run([sys.executable, __file__, "--benchmark-case", name, str(width), str(height), str(repeats)], check=True)
+
+
+#Per-frame latency of FocusAssist.update against scoring the full frame, on synthetic 5, 12 and 20 MP frames
+#Run with: python focus.py --assist-benchmark
+def benchmarkAssist(sizes=((2592, 1944), (4000, 3000), (5472, 3648)), repeats=10):
+    rng = np.random.default_rng(0)
+    for width, height in sizes:
+        frame = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (5, 5), 0)
+        print(f"{width}x{height} ({width*height/1e6:.1f} MP), mean of {repeats}")
+        cases = (("full frame", lambda: Focus.computeAll(frame, ("sobelVariance",))),
+                 ("assist ROI", FocusAssist().update),
+                 ("assist ROI /2", FocusAssist(decimation=2).update))
+        for name, run in cases:
+            args = () if name == "full frame" else (frame,)
+            run(*args)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                run(*args)
+            milliseconds = (time.perf_counter() - start) / repeats * 1000
+            print(f"  {name:<14} {milliseconds:7.2f} ms  ({1000/milliseconds:6.1f} fps)")
+
+
+if __name__ == '__main__':
+    import sys
+    if '--benchmark' in sys.argv:
+        benchmark()
+    if '--benchmark-case' in sys.argv:
+        name, width, height, repeats = sys.argv[sys.argv.index('--benchmark-case') + 1:][:4]
+        _benchmarkCase(name, int(width), int(height), int(repeats))
+    if '--assist-benchmark' in sys.argv:
+        benchmarkAssist()
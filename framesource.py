@@ -0,0 +1,175 @@
+import glob
+import os
+import queue
+import threading
+import time
+import cv2
+from focus import Focus
+from colorbalance import Color
+
+#Frame sources for live analysis, all of them yield BGR frames like cv2.imread
+#FolderSource is the file-backed stand-in for a camera (e.g. for tests), VideoSource wraps cv2.VideoCapture (video file or device)
+class FrameSource:
+    def __iter__(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FolderSource(FrameSource):
+    extensions = ("*.tif", "*.tiff", "*.png", "*.jpg", "*.jpeg", "*.bmp")
+
+    #fps paces the frames like a camera would (0 = as fast as they decode), loop replays the folder forever
+    def __init__(self, folder, fps=0, loop=False):
+        self.paths = sorted(p for pattern in FolderSource.extensions for p in glob.glob(os.path.join(folder, pattern)))
+        if not self.paths:
+            raise FileNotFoundError(f"No images found in {folder}")
+        self.fps = fps
+        self.loop = loop
+
+    def __iter__(self):
+        nextFrame = time.perf_counter()
+        while True:
+            for path in self.paths:
+                frame = cv2.imread(path, cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                if self.fps:
+                    nextFrame += 1.0 / self.fps
+                    time.sleep(max(0.0, nextFrame - time.perf_counter()))
+                yield frame
+            if not self.loop:
+                return
+
+
+class VideoSource(FrameSource):
+    #device is a video file path, a stream URL or a camera index
+    def __init__(self, device=0):
+        self.capture = cv2.VideoCapture(device)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open video source: {device}")
+
+    def __iter__(self):
+        while True:
+            ok, frame = self.capture.read()
+            if not ok:
+                return
+            yield frame
+
+    def close(self):
+        self.capture.release()
+
+
+#Picks the source for a camera index ("0"), an image folder or a video file
+def openSource(spec, **kwargs):
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return VideoSource(int(spec))
+    if os.path.isdir(spec):
+        return FolderSource(spec, **kwargs)
+    return VideoSource(spec)
+
+
+#Feeds frames from a source to a set of analyzers {name: function(frame)} on a background thread
+#Frames go through a bounded queue; when the analyzers fall behind the oldest queued frame is dropped, so results
+#always describe a recent frame and memory stays bounded at camera frame rate
+class FramePump:
+    def __init__(self, source, analyzers=None, maxQueue=2, callback=None):
+        self.source = source
+        self.analyzers = analyzers if analyzers is not None else FramePump.defaultAnalyzers()
+        self.callback = callback
+        self.frames = queue.Queue(maxsize=maxQueue)
+        self.framesRead = 0
+        self.framesDropped = 0
+        self.framesAnalyzed = 0
+        self._latest = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    #Focus and brightness are cheap enough for every frame, color balance needs a card in view and is left out
+    def defaultAnalyzers():
+        return {
+            "focus": lambda frame: Focus.computeAll(frame, ("sobelVariance",))["sobelVariance"],
+            "intensity": Color.get_average_light_intensity,
+        }
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._produce, daemon=True),
+                         threading.Thread(target=self._consume, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _produce(self):
+        try:
+            for frame in self.source:
+                if self._stop.is_set():
+                    break
+                self.framesRead += 1
+                self._offer(frame)
+        finally:
+            #End of stream marker, the consumer finishes what is queued and exits
+            self._offer(None)
+
+    #Queues an item without ever blocking, dropping the oldest queued frame when full
+    def _offer(self, item):
+        while True:
+            try:
+                self.frames.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    if self.frames.get_nowait() is not None:
+                        self.framesDropped += 1
+                except queue.Empty:
+                    pass
+
+    def _consume(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None or self._stop.is_set():
+                break
+            result = {"frame": self.framesAnalyzed, "errors": {}}
+            for name, analyzer in self.analyzers.items():
+                try:
+                    result[name] = analyzer(frame)
+                except Exception as e:
+                    result["errors"][name] = str(e)
+            self.framesAnalyzed += 1
+            with self._lock:
+                self._latest = result
+            if self.callback is not None:
+                self.callback(result)
+
+    #Most recent analysis result (None until the first frame is done)
+    def latest(self):
+        with self._lock:
+            return self._latest
+
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    #Waits for the source to run out (or until timeout)
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stop(self):
+        self._stop.set()
+        #Wakes the consumer if it is waiting on an empty queue
+        self._offer(None)
+        self.join()
+        self.source.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,47 @@
+import cv2
+from collections import OrderedDict
+from threading import Lock
+
+#Lazy list of images on disk, nothing is decoded until an image is asked for
+#cacheSize bounds how many decoded images are kept in memory (0 keeps none, so memory does not grow with the number of images)
+class ImageSource:
+    def __init__(self, paths, flags=cv2.IMREAD_COLOR, cacheSize=0):
+        self.paths = list(paths)
+        self.flags = flags
+        self.cacheSize = cacheSize
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        return self.load(index)
+
+    def __iter__(self):
+        for i in range(len(self.paths)):
+            yield self.load(i)
+
+    def load(self, index):
+        path = self.paths[index]
+        with self._lock:
+            img = self._cache.get(path)
+            if img is not None:
+                #Most recently used goes to the back, least recently used is evicted first
+                self._cache.move_to_end(path)
+                return img
+
+        img = cv2.imread(path, self.flags)
+        if img is None:
+            raise FileNotFoundError(f"Could not read image: {path}")
+
+        if self.cacheSize > 0:
+            with self._lock:
+                self._cache[path] = img
+                while len(self._cache) > self.cacheSize:
+                    self._cache.popitem(last=False)
+        return img
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
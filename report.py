@@ -7,33 +7,178 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from resolution import Resolution
 from focus import Focus
 from colorbalance import Color
-from colorcards import small24_color_card
+from colorcards import Colorcard, small24_color_card
+from results import ReportResults
+from colorcorrection import ColorCorrection
+from tiledimage import TiledImage
 import cv2
+import os
+import sys
+import numpy as np
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 
 class Pdf:
+    # Default inputs for a single station run, the batch runner (batch.py) passes its own per camera
+    focusImagePath = "/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/stitched_vertical copy 2.bmp"
+    intensityImagePath = "/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Big Card/Characterization_2025-11-06_15-36-42.csv.tif"
+    colorcardImagePath = "/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Small card/Characterization_2025-11-06_14-59-55.csv.tif" #Feed in color card so white is top left for best results
+    logoPath = "/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Platypus-Vision.jpg"
+    #Image paths can be changed to test different images. Resolution needs to have at least 10 images of chessboard pattern in the specified folder, the rest can be single images.
+
+    # Thresholds
+    #These thresholds can be adjusted based on requirements, they are only applied when rendering so changing one does not need a new analysis
+    thresholds = {
+        "focus": 150000.0,
+        "reprojection_error": 1.0,
+        "light_intensity": (120.0, 180.0),
+        "color_distance_metric": "ciede2000", #"ciede2000", "cie94", "cie76" or "euclidean" (RGB distance, use a threshold around 40.0)
+        "color_distance": 10.0, #CIEDE2000 ΔE between measured and reference patch
+        "color_correction_model": "3x4", #Correction fitted to the card for the "after correction" column: "3x3", "3x4" or "root-polynomial"
+    }
+
+    # Runs {name: function} concurrently on a thread pool and returns {name: (result, error)}, error is None on success
+    # The metrics spend most of their time in OpenCV calls that release the GIL, so the wall-clock time is close to the slowest one
     @staticmethod
-    def report():
-
-        # Thresholds
-        #How many rows and columns are on the color card being used
-        rows = 6
-        cols = 4
-        color_card = small24_color_card
-        summary_row_index = 1  
-        colorDistanceThreshold = 40.0 #Using Euclidean Distance in RGB space for color difference
-        reproductionErrorThreshold = 1.0
-        min_intensity, max_intensity = 120.0, 180.0
-        focusThreshold = 150000.0
-        #These thresholds can be adjusted based on requirements 
-        imgPath = cv2.imread("/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/stitched_vertical copy 2.bmp", cv2.IMREAD_COLOR)
-        imgPathForLightIntensity = cv2.imread("/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Big Card/Characterization_2025-11-06_15-36-42.csv.tif", cv2.IMREAD_COLOR)
-        colorcardImg = cv2.imread("/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Small card/Characterization_2025-11-06_14-59-55.csv.tif", cv2.IMREAD_COLOR) #Feed in color card so white is top left for best results 
-        #Image paths can be changed to test different images. Resolution needs to have at least 10 images of chessboard pattern in the specified folder, the rest can be single images.
+    def run_metrics(tasks, workers=None):
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers or len(tasks)) as pool:
+            futures = {name: pool.submit(task) for name, task in tasks.items()}
+            for name, future in futures.items():
+                try:
+                    results[name] = (future.result(), None)
+                except Exception as e:
+                    results[name] = (None, e)
+        return results
+
+    # Everything besides the input files that changes what analyze measures, part of the fingerprint of saved results
+    @staticmethod
+    def analysis_settings(color_card=small24_color_card, rows=6, cols=4):
+        target = Resolution.defaultTarget()
+        return {
+            "target": [type(target).__name__, *target.params()],
+            "max_detect_side": Resolution.maxDetectSide,
+            "fast_check": Resolution.fastCheck,
+            "card_name": color_card.get_color_card_name(),
+            "rows": rows,
+            "cols": cols,
+        }
+
+    # Analysis stage: runs every metric and returns a ReportResults, nothing is rendered
+    # chessboardPaths defaults to Resolution.paths, any image path left as None uses the defaults above
+    # calibrationWorkers is the number of corner detection threads (None = one per CPU, see Resolution.findCorners)
+    #How many rows and columns are on the color card being used
+    @staticmethod
+    def analyze(focusImagePath=None, intensityImagePath=None, colorcardImagePath=None, chessboardPaths=None,
+                color_card=small24_color_card, rows=6, cols=4, calibrationWorkers=None):
+        imgPath = focusImagePath or Pdf.focusImagePath
+        imgPathForLightIntensity = intensityImagePath or Pdf.intensityImagePath
+        colorcardImgPath = colorcardImagePath or Pdf.colorcardImagePath
+        chessboardPaths = list(chessboardPaths) if chessboardPaths is not None else list(Resolution.paths)
+
+        # The four analyses are independent, run them concurrently (each task loads its own image) and collect results and errors
+        # Focus and intensity go strip by strip over a memory-mapped TiledImage, so huge stitched captures are never fully loaded
+        metrics = Pdf.run_metrics({
+            "focus": lambda: Focus.computeSobelVarianceTiled(TiledImage.open(imgPath)),
+            "resolution": lambda: Resolution.calibrate(paths=chessboardPaths, workers=calibrationWorkers),
+            "intensity": lambda: Color.light_intensity_statistics(TiledImage.open(imgPathForLightIntensity)),
+            "color": lambda: Color.colorbalance(cv2.imread(colorcardImgPath, cv2.IMREAD_COLOR), rows, cols),
+        })
+
+        results = ReportResults(
+            inputs={"focus": imgPath, "intensity": imgPathForLightIntensity, "colorcard": colorcardImgPath, "chessboard": chessboardPaths},
+            fingerprint=ReportResults.input_fingerprint([imgPath, imgPathForLightIntensity, colorcardImgPath] + chessboardPaths,
+                                                        Pdf.analysis_settings(color_card, rows, cols)),
+            card_name=color_card.get_color_card_name(),
+            reference_colors={name: list(rgb) for name, rgb in color_card.reference_colors.items()},
+            rows=rows,
+            cols=cols,
+            errors={name: str(error) for name, (result, error) in metrics.items() if error is not None},
+        )
+
+        focusVal, error = metrics["focus"]
+        if error is not None:
+            print("Error computing focus value:", error)
+        else:
+            results.focus_value = float(focusVal)
+            print("Computed focus value:", focusVal)
+
+        calibration, error = metrics["resolution"]
+        if error is not None:
+            print("Error during resolution calibration:", error)
+        else:
+            cameraMatrix, reproductionError, distCoefficients = calibration
+            results.camera_matrix = np.asarray(cameraMatrix).tolist()
+            results.reprojection_error = float(reproductionError)
+            results.dist_coefficients = np.ravel(distCoefficients).tolist()
+            print("Resolution calibration successful.")
+
+        statistics, error = metrics["intensity"]
+        if error is not None:
+            print("Error computing light intensity:", error)
+        else:
+            results.light_intensity = statistics["mean"]
+            results.light_statistics = statistics
+            print("Computed light intensity:", statistics["mean"])
+
+        measured_bgr, error = metrics["color"]
+        if error is not None:
+            print("Error during color balance analysis:", error)
+            measured_bgr = [(0, 0, 0)] * len(color_card.reference_colors)
+        else:
+            print("Color balance analysis successful.")
+        results.measured_bgr = [np.asarray(color, dtype=float).tolist() for color in measured_bgr]
+
+        return results
+
+    # Pass/fail of every metric for the given results and thresholds
+    @staticmethod
+    def evaluate(results, thresholds=None):
+        thresholds = dict(Pdf.thresholds, **(thresholds or {}))
+        color_card = Colorcard(results.card_name, {name: tuple(rgb) for name, rgb in results.reference_colors.items()})
+        min_intensity, max_intensity = thresholds["light_intensity"]
+
+        # Convert and score every patch in one call each, the reference side is precomputed on the card
+        measured_rgb = np.zeros((len(color_card.names), 3))
+        for i, meas_bgr in enumerate(results.measured_bgr[:len(color_card.names)]):
+            measured_rgb[i] = meas_bgr[::-1]  # Convert BGR to RGB
+        distances = color_card.distances(measured_rgb, thresholds["color_distance_metric"])
+        colorPasses = distances <= thresholds["color_distance"]
+
+        # What is left after a color correction matrix fitted to the same patches (pass/fail stays on the uncorrected colors)
+        # Not fitted when the color analysis failed, measured_rgb is only a placeholder then
+        correction = None
+        corrected_distances = None
+        if "color" not in results.errors:
+            correction = ColorCorrection.fit(measured_rgb, color_card.rgb, thresholds["color_correction_model"])
+            corrected_distances = color_card.distances(correction.correct_rgb(measured_rgb), thresholds["color_distance_metric"])
+
+        return {
+            "thresholds": thresholds,
+            "color_card": color_card,
+            "focus_pass": bool(results.focus_value >= thresholds["focus"]),
+            "reprojection_pass": bool(results.reprojection_error < thresholds["reprojection_error"]),
+            "light_intensity_pass": bool(min_intensity <= results.light_intensity <= max_intensity),
+            "measured_rgb": measured_rgb,
+            "color_distances": distances,
+            "color_passes": colorPasses,
+            "color_correction": correction,
+            "corrected_color_distances": corrected_distances,
+            # If any color fails, the color balance fails overall
+            "color_pass": bool(np.all(colorPasses)),
+        }
+
+    # Rendering stage: builds the PDF from ReportResults (fresh or loaded from disk) and returns a summary dict
+    @staticmethod
+    def render(results, output="CameraCalibrationReport.pdf", thresholds=None, logoPath=None):
+        logoPath = logoPath or Pdf.logoPath
+        evaluation = Pdf.evaluate(results, thresholds)
+        thresholds = evaluation["thresholds"]
+        color_card = evaluation["color_card"]
 
         # Report Setup
-        doc = SimpleDocTemplate("CameraCalibrationReport.pdf",
+        doc = SimpleDocTemplate(output,
                                 pagesize=A4,
                                 leftMargin=40,
                                 rightMargin=40,
@@ -48,10 +193,11 @@ class Pdf:
         elements.append(title)
         elements.append(Spacer(1, 12))
 
-        # Logo 
-        logo = Image("/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Platypus-Vision.jpg", width=100, height=75)
-        elements.append(logo)
-        elements.append(Spacer(1, 12))
+        # Logo
+        if os.path.exists(logoPath):
+            logo = Image(logoPath, width=100, height=75)
+            elements.append(logo)
+            elements.append(Spacer(1, 12))
 
         # Card name
         card_info = Paragraph(
@@ -61,9 +207,8 @@ class Pdf:
         elements.append(card_info)
         elements.append(Spacer(1, 20))
 
-        # Time Stamp of Test Generation
-        now = datetime.now()
-        formatted_time = now.strftime("%A, %d %B %Y %H:%M:%S")
+        # Time Stamp of Test Generation (when the measurements were taken)
+        formatted_time = datetime.fromisoformat(results.generated).strftime("%A, %d %B %Y %H:%M:%S")
         time_stamp = Paragraph(
             f"<b>Generated on:</b> {formatted_time}",
             styles["Normal"]
@@ -83,68 +228,46 @@ class Pdf:
                 ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
             ]))
             return table
-        
-        # Calibration Metrics (placeholder table for it to be updated later to have correct pass/fail)
+
+        # Helper: Colored Pass/Fail paragraph
+        def result_para(passed):
+            text_color = "green" if passed else "red"
+            return Paragraph(f'<font color="{text_color}">{"Pass" if passed else "Fail"}</font>', styles["Normal"])
+
+        # Calibration Metrics
         elements.append(Paragraph("<b>Calibration Summary</b>", styles["Heading2"]))
-        summary_data = [
-            ["Metric", "Pass/Fail"],
-            ["Focus Value", "---"],
-            ["Resolution", "---"],
-            ["Light Intensity", "---"],
-            ["Color Balance", "---"]
+        summary_passes = [
+            ("Focus Value", evaluation["focus_pass"]),
+            ("Resolution", evaluation["reprojection_pass"]),
+            ("Light Intensity", evaluation["light_intensity_pass"]),
+            ("Color Balance", evaluation["color_pass"]),
         ]
+        summary_data = [["Metric", "Pass/Fail"]] + [[name, "Pass" if passed else "Fail"] for name, passed in summary_passes]
         summary_table = Table(summary_data, colWidths=[150, 150, 100], rowHeights=25)
 
-        summary_table.setStyle(TableStyle([
+        summary_style = TableStyle([
             ('GRID', (0,0), (-1,-1), 1, colors.black),
             ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ]))
+        ])
+        for row_index, (name, passed) in enumerate(summary_passes, start=1):
+            summary_style.add('TEXTCOLOR', (1,row_index), (1,row_index), colors.green if passed else colors.red)
+        summary_table.setStyle(summary_style)
 
         elements.append(summary_table)
         elements.append(Spacer(1, 20))
 
         # Focus Analysis
         elements.append(Paragraph("<b>Focus Analysis</b>", styles["Heading2"]))
-        try:
-            focusVal = Focus.computeSobelVarianceCombo(imgPath)
-        except Exception as e:
-            print("Error computing focus value:", e)
-            focusVal = -1.0 
-            focusThreshold = focusThreshold
-        else:   
-            print("Computed focus value:", focusVal)
-
-        isFocusPass = focusVal >= focusThreshold
-        summary_table._cellvalues[summary_row_index][1] = "Pass" if isFocusPass else "Fail"
-        if isFocusPass:     summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.green)]))
-        else:               summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.red)]))
-        summary_row_index+=1
-
-
-        focus_result_text = "Pass" if isFocusPass else "Fail"
-        focus_text_color = "green" if isFocusPass else "red"
-        focus_result_para = Paragraph(f'<font color="{focus_text_color}">{focus_result_text}</font>', styles["Normal"])
- 
         elements.append(make_table([
             ["Focus Value", "Threshold", "Pass/Fail"],
-            [f"{focusVal:.2f}", f"{focusThreshold}", focus_result_para]
+            [f"{results.focus_value:.2f}", f"{thresholds['focus']}", result_para(evaluation["focus_pass"])]
         ], col_widths=[120, 120, 120]))
         elements.append(Spacer(1, 20))
 
         # Resolution Analysis
         elements.append(Paragraph("<b>Resolution Analysis</b>", styles["Heading2"]))
 
-        try:
-            cameraMatrix, reproductionError, distCoefficients = Resolution.calibrate()
-        except Exception as e:
-            print("Error during resolution calibration:", e)
-            cameraMatrix = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
-            reproductionError = float('inf')
-            distCoefficients = [0.0, 0.0, 0.0, 0.0, 0.0]
-        else:
-            print("Resolution calibration successful.")
-
-        cam_rows = [[f"{v:.3f}" for v in row] for row in cameraMatrix]
+        cam_rows = [[f"{v:.3f}" for v in row] for row in results.camera_matrix]
 
         elements.append(make_table(
             [["Camera Matrix", "", ""]] + cam_rows,
@@ -153,144 +276,152 @@ class Pdf:
         elements.append(Spacer(1, 20))
 
         # Distortion Coefficients
-        distCoefficients = distCoefficients.flatten()
-        dist_rows = [[f"{v:.5f}"] for v in distCoefficients] 
+        dist_rows = [[f"{v:.5f}"] for v in results.dist_coefficients]
 
         dist_rows.insert(0, ["Distortion Coefficients"])
 
         elements.append(make_table(
             dist_rows,
-            col_widths=[120] 
+            col_widths=[120]
         ))
         elements.append(Spacer(1, 20))
 
         # Reprojection Error
         elements.append(Paragraph("<b>Reprojection Error</b>", styles["Heading2"]))
-        isReprojectPass = reproductionError < reproductionErrorThreshold
-        summary_table._cellvalues[summary_row_index][1] = "Pass" if isReprojectPass else "Fail"
-        if isReprojectPass:     summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.green)]))
-        else:               summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.red)]))
-        summary_row_index+=1
-
-
-        reproduction_result_text = "Pass" if isReprojectPass else "Fail"
-        reproduction_text_color = "green" if isReprojectPass else "red"
-        reproduction_result_para = Paragraph(f'<font color="{reproduction_text_color}">{reproduction_result_text}</font>', styles["Normal"])
- 
         elements.append(make_table([
             ["Reprojection Error", "Threshold", "Pass/Fail"],
-            [f"{reproductionError:.4f}", reproductionErrorThreshold, reproduction_result_para]
+            [f"{results.reprojection_error:.4f}", thresholds["reprojection_error"], result_para(evaluation["reprojection_pass"])]
         ], col_widths=[120, 120, 120]))
         elements.append(Spacer(1, 20))
 
         # Light Intensity
         elements.append(Paragraph("<b>Light Intensity Analysis</b>", styles["Heading2"]))
-
-        try:
-            intensity = Color.get_average_light_intensity(imgPathForLightIntensity)
-        except Exception as e:
-            print("Error computing light intensity:", e)
-            intensity = -1.0 # Invalid value to indicate error
-        else:   
-            print("Computed light intensity:", intensity)
-
-        isIntensityPass = min_intensity <= intensity <= max_intensity
-        summary_table._cellvalues[summary_row_index][1] = "Pass" if isIntensityPass else "Fail"
-        if isIntensityPass:     summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.green)]))
-        else:               summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.red)]))
-        summary_row_index+=1
-
-
-        intensity_result_text = "Pass" if isIntensityPass else "Fail"
-        intensity_text_color = "green" if isIntensityPass else "red"
-        intensity_result_para = Paragraph(f'<font color="{intensity_text_color}">{intensity_result_text}</font>', styles["Normal"])
- 
+        min_intensity, max_intensity = thresholds["light_intensity"]
         elements.append(make_table([
             ["Light Intensity", "Good Range", "Pass/Fail"],
-            [f"{intensity:.2f}", f"({min_intensity}, {max_intensity})", intensity_result_para]
+            [f"{results.light_intensity:.2f}", f"({min_intensity}, {max_intensity})", result_para(evaluation["light_intensity_pass"])]
         ], col_widths=[120, 150, 100]))
         elements.append(Spacer(1, 20))
 
-        # Color Analysis 
+        # Illumination details (results saved before these were measured have none)
+        statistics = results.light_statistics
+        if statistics:
+            percentiles = statistics["percentiles"]
+            elements.append(make_table([
+                ["5th - 95th Percentile", "Clipped Dark / Bright", "Uniformity", "Corner Falloff"],
+                [f"{percentiles.get('p5', '-')} - {percentiles.get('p95', '-')}",
+                 f"{statistics['clipped_dark']:.2%} / {statistics['clipped_bright']:.2%}",
+                 f"{statistics['uniformity']:.2f}",
+                 f"{statistics['corner_falloff']:.2f}"]
+            ], col_widths=[120, 130, 90, 90]))
+            elements.append(Spacer(1, 20))
+
+        # Color Analysis
         elements.append(Paragraph("<b>Color Balance Analysis</b>", styles["Heading2"]))
 
-        color_dict = color_card.reference_colors
-        summary_result = True
-
-        try:
-            measured_bgr = Color.colorbalance(colorcardImg, rows, cols)
-        except Exception as e:
-            print("Error during color balance analysis:", e)
-            measured_bgr = [(0, 0, 0)] * len(color_dict)
-        else:
-            print("Color balance analysis successful.")
-
-        data = [["Color", "HSV (H°, S%, V%)", "Sample", "Reference", "Pass/Fail"]]
-
-        for i, (name, ref_rgb) in enumerate(color_dict.items()):
-            meas_bgr = measured_bgr[i] if i < len(measured_bgr) else (0, 0, 0)
-            b,g,r = meas_bgr
-            meas_rgb = (r, g, b)  # Convert BGR to RGB
-
-            meas_hsv = Color.rgb_to_hsv_tuple(meas_rgb)
-            distance = Color.color_distance(meas_rgb, ref_rgb)
-            h,s,v = meas_hsv
-           
-            colorPass = distance <= colorDistanceThreshold
-
-            # If any color fails, summary_result becomes False for overall pass/fail
-            if not colorPass:
-                summary_result = False
-
-            result = "Pass" if colorPass else "Fail"
-            text_color = "green" if result == "Pass" else "red"
-            result_para = Paragraph(f'<font color="{text_color}">{result}</font>', styles["Normal"])
+        measured_rgb = evaluation["measured_rgb"]
+        measured_hsv = Color.rgb_to_hsv_array(measured_rgb)
+        corrected_distances = evaluation["corrected_color_distances"]
 
+        data = [["Color", "HSV (H°, S%, V%)", "Sample", "Reference", "ΔE", "ΔE Corr.", "Pass/Fail"]]
+        for i, name in enumerate(color_card.names):
+            h,s,v = measured_hsv[i]
             data.append([
                 name,
-                f"{h}°, {s}%, {v}%",    
-                "",               
-                "",               
-                result_para                
+                f"{h}°, {s}%, {v}%",
+                "",
+                "",
+                f"{evaluation['color_distances'][i]:.2f}",
+                f"{corrected_distances[i]:.2f}" if corrected_distances is not None else "-",
+                result_para(evaluation["color_passes"][i])
             ])
 
-        table = Table(data, colWidths=[120, 120, 60, 60, 60], rowHeights=25)
+        table = Table(data, colWidths=[100, 100, 50, 60, 50, 55, 60], rowHeights=25)
 
         style = TableStyle([
             ('GRID', (0,0), (-1,-1), 1, colors.black),
         ])
 
         # Apply sample + reference colors for visualization
-        for row_index, ((name, ref_rgb), meas_bgr) in enumerate(zip(color_dict.items(), measured_bgr), start=1):
-            
-            # Sample 
-            b, g, r = meas_bgr
-            r = r / 255
-            g = g / 255
-            b = b / 255
+        for row_index, (meas_rgb, ref_rgb) in enumerate(zip(measured_rgb, color_card.rgb), start=1):
+
+            # Sample
+            r, g, b = [min(max(v/255, 0.0), 1.0) for v in meas_rgb]
             style.add('BACKGROUND', (2, row_index), (2, row_index), colors.Color(r, g, b))
 
-            # Reference 
+            # Reference
             r, g, b = [v/255 for v in ref_rgb]
             style.add('BACKGROUND', (3, row_index), (3, row_index), colors.Color(r, g, b))
-        
-        summary_table._cellvalues[summary_row_index][1] = "Pass" if summary_result else "Fail"
-        if summary_result:     summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.green)]))
-        else:               summary_table.setStyle(TableStyle([('TEXTCOLOR', (1,summary_row_index), (1,summary_row_index), colors.red)]))
-        summary_row_index+=1
 
         table.setStyle(style)
         elements.append(table)
         elements.append(Spacer(1, 20))
 
+        # Color correction, mean ΔE before and after
+        elements.append(make_table([
+            ["Correction Model", "Mean ΔE", "Mean ΔE Corrected", "Max ΔE Corrected"],
+            [thresholds["color_correction_model"],
+             f"{np.mean(evaluation['color_distances']):.2f}",
+             f"{np.mean(corrected_distances):.2f}" if corrected_distances is not None else "-",
+             f"{np.max(corrected_distances):.2f}" if corrected_distances is not None else "-"]
+        ], col_widths=[110, 100, 120, 120]))
+        elements.append(Spacer(1, 20))
+
         # Build PDF
+        pdfBuilt = False
         try:
             doc.build(elements)
         except Exception as e:
             print("Error building PDF:", e)
         else:
+            pdfBuilt = True
             print("PDF report generated successfully.")
 
+        return {
+            "output": output,
+            "pdf_built": pdfBuilt,
+            "focus_value": results.focus_value,
+            "focus_pass": evaluation["focus_pass"],
+            "reprojection_error": results.reprojection_error,
+            "reprojection_pass": evaluation["reprojection_pass"],
+            "light_intensity": results.light_intensity,
+            "light_intensity_pass": evaluation["light_intensity_pass"],
+            "color_max_distance": float(np.max(evaluation["color_distances"])),
+            "color_max_distance_corrected": float(np.max(corrected_distances)) if corrected_distances is not None else None,
+            "color_pass": evaluation["color_pass"],
+            "errors": dict(results.errors),
+        }
+
+    # Analyze + render. With resultsPath the measurements are saved there, and reused instead of recomputed
+    # as long as the same input files are unchanged and were analyzed with the same settings, so only the rendering runs again
+    # Results in which a metric failed are never reused, the analysis is retried
+    @staticmethod
+    def report(focusImagePath=None, intensityImagePath=None, colorcardImagePath=None, chessboardPaths=None,
+               output="CameraCalibrationReport.pdf", logoPath=None, resultsPath=None, thresholds=None,
+               color_card=small24_color_card, rows=6, cols=4, calibrationWorkers=None):
+        results = None
+        if resultsPath is not None and os.path.exists(resultsPath):
+            cached = ReportResults.load(resultsPath)
+            inputs = [focusImagePath or Pdf.focusImagePath, intensityImagePath or Pdf.intensityImagePath, colorcardImagePath or Pdf.colorcardImagePath]
+            inputs += list(chessboardPaths) if chessboardPaths is not None else list(Resolution.paths)
+            fingerprint = ReportResults.input_fingerprint(inputs, Pdf.analysis_settings(color_card, rows, cols))
+            if not cached.errors and cached.fingerprint == fingerprint:
+                print("Reusing cached results from", resultsPath)
+                results = cached
+
+        if results is None:
+            results = Pdf.analyze(focusImagePath, intensityImagePath, colorcardImagePath, chessboardPaths, color_card, rows, cols,
+                                  calibrationWorkers)
+            if resultsPath is not None:
+                results.save(resultsPath)
+
+        return Pdf.render(results, output, thresholds, logoPath)
+
 
 if __name__ == "__main__":
-    Pdf.report()
+    # python report.py --render results.json [output.pdf] re-renders saved results without running any analysis
+    if len(sys.argv) > 2 and sys.argv[1] == "--render":
+        output = sys.argv[3] if len(sys.argv) > 3 else "CameraCalibrationReport.pdf"
+        Pdf.render(ReportResults.load(sys.argv[2]), output)
+    else:
+        Pdf.report()
@@ -1,7 +1,12 @@
 import numpy as np
 import cv2
-import glob
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from imagesource import ImageSource
+from targets import Chessboard
 
 class Resolution:
     
@@ -24,56 +29,250 @@ class Resolution:
         "/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Chess board/Characterization_2025-11-06_15-27-39.csv.tif",            
         "/Users/josephsteriti/Downloads/Platypus Vision/OneDrive_1_11-10-2025/Chess board/Characterization_2025-11-06_15-27-58.csv.tif",
         ]
-    imgs = [cv2.imread(p) for p in paths]
-        
+    #Images are only decoded when calibration asks for them
+    imgs = ImageSource(paths)
+
+    #Chessboard detection settings
+    #IMPORTANT COUNT ROWS AND COLUMNS
+    nRows = 9
+    nCols = 6
+    subPixWindow = (11, 11)
+    terminationCriteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    #Coarse-to-fine: find the board on a copy whose longest side is at most maxDetectSide pixels, then refine at full resolution (0 = detect at full resolution)
+    maxDetectSide = 0
+    #fastCheck quickly rejects frames that do not contain a board instead of searching them exhaustively
+    fastCheck = False
+
+    #Calibration target (see targets.py), None = the nRows x nCols chessboard configured above
+    target = None
+
+    def defaultTarget():
+        if Resolution.target is not None:
+            return Resolution.target
+        return Chessboard(Resolution.nRows, Resolution.nCols, subPixWindow=Resolution.subPixWindow,
+                          terminationCriteria=Resolution.terminationCriteria)
+
+    #Detects a calibration target in a single image (BGR array or path)
+    #Returns (image points or None if the target was not found, ids of a partial detection or None, image size, seconds spent on the image)
+    def detectTarget(img, target, maxDetectSide=0, fastCheck=False):
+        start = time.perf_counter()
+        imgBGR = cv2.imread(img) if isinstance(img, str) else img
+        imgGray = cv2.cvtColor(imgBGR, cv2.COLOR_BGR2GRAY)
+        corners, ids = target.detect(imgGray, maxDetectSide, fastCheck)
+        return corners, ids, imgGray.shape[::-1], time.perf_counter() - start
+
+    #Runs detectTarget over every image using a pool of workers
+    #images is an ImageSource or a list of paths, each image is decoded once and dropped after detection
+    #executor can be "thread" (OpenCV releases the GIL) or "process", workers=1 runs serially
+    #cache is an optional CornerCache, only images that are not in it get decoded and detected
+    #maxDetectSide and fastCheck default to the class settings when left as None, target to defaultTarget()
+    #Results are collected in the order of paths so calibrateCamera gets the same input regardless of scheduling
+    #Views where only part of the target was found (ChArUco) are used with the points that were found,
+    #views the target does not consider usable (too few points, all on one line) count as not found
+    def findCorners(images=None, workers=None, executor="thread", cache=None, maxDetectSide=None, fastCheck=None, target=None):
+        if images is None:
+            images = Resolution.imgs
+        source = images if isinstance(images, ImageSource) else ImageSource(images)
+        paths = source.paths
+
+        if maxDetectSide is None:
+            maxDetectSide = Resolution.maxDetectSide
+        if fastCheck is None:
+            fastCheck = Resolution.fastCheck
+        if target is None:
+            target = Resolution.defaultTarget()
+
+        detectParams = target.params() + (maxDetectSide, fastCheck)
+        detect = partial(Resolution.detectTarget, target=target, maxDetectSide=maxDetectSide, fastCheck=fastCheck)
+
+        results = [None] * len(paths)
+        keys = [None] * len(paths)
+        if cache is not None:
+            for i, curImgPath in enumerate(paths):
+                start = time.perf_counter()
+                keys[i] = cache.key(curImgPath, detectParams)
+                hit = cache.get(keys[i])
+                if hit is not None:
+                    corners, imageSize, ids = hit
+                    results[i] = (corners, ids, imageSize, time.perf_counter() - start)
+        pending = [i for i in range(len(paths)) if results[i] is None]
+
+        if workers is None:
+            workers = max(1, min(len(pending), os.cpu_count() or 1))
+
+        if workers == 1:
+            detected = [detect(source[i]) for i in pending]
+        elif executor == "process":
+            #Worker processes decode their own images, only paths and corners cross the process boundary
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                #map yields results in submission order, not completion order
+                detected = list(pool.map(detect, [paths[i] for i in pending]))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                detected = list(pool.map(lambda i: detect(source[i]), pending))
+
+        for i, result in zip(pending, detected):
+            results[i] = result
+            if cache is not None:
+                cache.put(keys[i], result[0], result[2], result[1])
+
+        worldPtsList = []
+        imgPtsList = []
+        timings = []
+        imageSize = None
+
+        for curImgPath, (corners, ids, size, seconds) in zip(paths, results):
+            imageSize = size
+            if corners is not None and not target.usable(ids):
+                corners = None
+            timings.append((curImgPath, seconds, corners is not None))
+            if corners is not None:
+                worldPtsList.append(target.objectPoints(ids))
+                imgPtsList.append(corners)
+
+        return worldPtsList, imgPtsList, imageSize, timings
+
 
     #IMPORT INFO
     #COUNT corners and rows correctly or else returns false
     #Need at least 10 INPUTTED images for good results
     #Images should be taken at different planes to avoid degenerate cases
-    #Entire chessboard needs to be inside of the image in order to function
-    def calibrate(showPics=True):
-
-        #Loading image
-        root = os.getcwd()
-        calibrationDir = os.path.join(root,'')
-        imgPathList = glob.glob(os.path.join(calibrationDir,'*.jpg'))
-
-        #Initializing image
-        #IMPORTANT COUNT ROWS AND COLUMNS
-        nRows = 9
-        nCols = 6
-        terminationCriteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
-        #Placeholders
-        worldPtsCurrent = np.zeros((nRows*nCols,3), np.float32)
-        worldPtsCurrent[:,:2] = np.mgrid[0:nRows, 0:nCols].T.reshape(-1,2)
-        worldPtsList = []
-        imgPtsList = []
+    #Entire chessboard needs to be inside of the image in order to function (a ChArUco target, see targets.py, does not)
+    #Pass a CornerCache as cache to skip detection on frames that were already processed in an earlier run
+    #With rejectOutliers the views with a much larger error than the rest are dropped and the solution is refined once (see diagnose)
+    def calibrate(showPics=True, workers=None, executor="thread", paths=None, cache=None, rejectOutliers=False, target=None):
 
-        #Feeding each image of the chessboard in
-        for curImgPath in Resolution.paths:
-            imgBGR = cv2.imread(curImgPath)
-            imgGray = cv2.cvtColor(imgBGR, cv2.COLOR_BGR2GRAY)
-            cornersFound, cornersOrg = cv2.findChessboardCorners(imgGray, (nRows, nCols), None)
+        diagnostics = Resolution.diagnose(workers, executor, paths, cache, rejectOutliers, target=target)
 
-            if cornersFound == True:
-                worldPtsList.append(worldPtsCurrent)
-                #Finding more accurate location of the corners
-                corners = cv2.cornerSubPix(imgGray,cornersOrg, (11,11), (-1,-1), terminationCriteria)
-                imgPtsList.append(corners)
-        #         if showPics:
-        #             #Draws corners in memory
-        #             cv2.drawChessboardCorners(imgBGR, (nRows, nCols), corners,cornersFound)
-        #             cv2.imshow('Chessboard', imgBGR)
-        #             cv2.waitKey(500)
-        # cv2.destroyAllWindows
-
-        reproductionError, cameraMatrix, distCoefficients, rvecs, tvecs = cv2.calibrateCamera(worldPtsList, imgPtsList, imgGray.shape[::-1], None, None)
+        for curImgPath, seconds, found in diagnostics["timings"]:
+            print('{:.3f}s {} {}'.format(seconds, 'found' if found else 'NOT FOUND', os.path.basename(curImgPath)))
+        for curImgPath, viewError in zip(diagnostics["viewPaths"], diagnostics["viewErrors"]):
+            rejected = curImgPath in diagnostics["rejectedPaths"]
+            print('{:.4f}px {}{}'.format(viewError, os.path.basename(curImgPath), ' REJECTED' if rejected else ''))
+
+        cameraMatrix = diagnostics["cameraMatrix"]
+        distCoefficients = diagnostics["distCoefficients"]
+        reproductionError = diagnostics["reprojectionError"]
         print('Camera Matrix:\n', cameraMatrix)
         print('Distortion Coefficients:\n', distCoefficients)
+        if diagnostics["rejectedPaths"]:
+            print('Reprojection Error before rejecting outliers (pixels): {:.4f}'.format(diagnostics["initialReprojectionError"]))
         print('Reprojection Error (pixels): {:.4f}'.format(reproductionError))
         return cameraMatrix, reproductionError, distCoefficients
 
+    #Calibration plus the per-view diagnostics, returns a dict with
+    #   cameraMatrix, distCoefficients, reprojectionError, rvecs, tvecs     the final solution (for the views that were kept)
+    #   viewPaths, viewErrors, cornerErrors                                 every view with a board and its RMS / per-corner error
+    #                                                                       against the initial solution
+    #   rejectedPaths, initialReprojectionError                             what rejectOutliers dropped and the error before that
+    #   timings                                                             as returned by findCorners
+    def diagnose(workers=None, executor="thread", paths=None, cache=None, rejectOutliers=False, threshold=None, maxRejectFraction=0.2,
+                 target=None):
+        images = Resolution.imgs if paths is None else ImageSource(paths)
+        worldPtsList, imgPtsList, imageSize, timings = Resolution.findCorners(images, workers, executor, cache, target=target)
+        viewPaths = [path for path, _, found in timings if found]
+
+        reproductionError, cameraMatrix, distCoefficients, rvecs, tvecs = cv2.calibrateCamera(worldPtsList, imgPtsList, imageSize, None, None)
+        viewErrors, cornerErrors = Resolution.reprojectionErrors(worldPtsList, imgPtsList, cameraMatrix, distCoefficients, rvecs, tvecs)
+
+        diagnostics = {
+            "viewPaths": viewPaths,
+            "viewErrors": viewErrors,
+            "cornerErrors": cornerErrors,
+            "rejectedPaths": [],
+            "initialReprojectionError": reproductionError,
+            "timings": timings,
+        }
+        if rejectOutliers:
+            kept, cameraMatrix, reproductionError, distCoefficients, rvecs, tvecs = Resolution.rejectOutliers(
+                worldPtsList, imgPtsList, imageSize, reproductionError, cameraMatrix, distCoefficients, rvecs, tvecs,
+                viewErrors, threshold, maxRejectFraction)
+            kept = set(kept)
+            diagnostics["rejectedPaths"] = [path for i, path in enumerate(viewPaths) if i not in kept]
+
+        diagnostics.update(cameraMatrix=cameraMatrix, distCoefficients=distCoefficients, reprojectionError=reproductionError,
+                           rvecs=rvecs, tvecs=tvecs)
+        return diagnostics
+
+    #Rotation matrices for a list of Rodrigues vectors, all at once
+    def _rotationMatrices(rvecs):
+        r = np.asarray(rvecs, dtype=np.float64).reshape(-1, 3)
+        theta = np.linalg.norm(r, axis=1)
+        k = r / np.where(theta > 0, theta, 1.0)[:, None]
+        cross = np.zeros((len(r), 3, 3))
+        cross[:, 0, 1], cross[:, 0, 2], cross[:, 1, 2] = -k[:, 2], k[:, 1], -k[:, 0]
+        cross -= cross.transpose(0, 2, 1)
+        sin, cos = np.sin(theta)[:, None, None], np.cos(theta)[:, None, None]
+        return cos * np.eye(3) + sin * cross + (1 - cos) * k[:, :, None] * k[:, None, :]
+
+    #Per-view and per-corner reprojection errors of a solved calibration without re-running it
+    #Every board is moved into the camera frame with its own pose in numpy, then the corners of all views are projected
+    #in a single projectPoints call with a zero pose, so the cost is one pass over the points instead of one call per view
+    #Returns (viewErrors: RMS error in pixels of each view, cornerErrors: array of per-corner errors in pixels for each view)
+    def reprojectionErrors(worldPtsList, imgPtsList, cameraMatrix, distCoefficients, rvecs, tvecs):
+        counts = [len(worldPts) for worldPts in worldPtsList]
+        views = np.repeat(np.arange(len(counts)), counts)
+        worldPts = np.concatenate([np.asarray(p, dtype=np.float64).reshape(-1, 3) for p in worldPtsList])
+        imgPts = np.concatenate([np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in imgPtsList])
+
+        rotations = Resolution._rotationMatrices(rvecs)
+        translations = np.asarray(tvecs, dtype=np.float64).reshape(-1, 3)
+        cameraPts = np.einsum('nij,nj->ni', rotations[views], worldPts) + translations[views]
+
+        projected, _ = cv2.projectPoints(cameraPts.reshape(-1, 1, 3), np.zeros(3), np.zeros(3), cameraMatrix, distCoefficients)
+        cornerErrors = np.linalg.norm(projected.reshape(-1, 2) - imgPts, axis=1)
+        viewErrors = np.sqrt(np.bincount(views, cornerErrors ** 2) / counts)
+        return viewErrors, np.split(cornerErrors, np.cumsum(counts)[:-1])
+
+    #Drops the views whose error is far above the rest, then refines the calibration once warm-started from the current solution
+    #threshold is in pixels, by default a view is an outlier above median + 3 * 1.4826 * MAD of the per-view errors
+    #At most maxRejectFraction of the views are dropped (worst first), and never so many that fewer than 3 remain
+    #Takes and returns the solution in calibrateCamera's order, unchanged when no view is an outlier
+    #Returns (indices of the kept views, cameraMatrix, reproductionError, distCoefficients, rvecs, tvecs)
+    def rejectOutliers(worldPtsList, imgPtsList, imageSize, reproductionError, cameraMatrix, distCoefficients, rvecs, tvecs,
+                       viewErrors=None, threshold=None, maxRejectFraction=0.2):
+        if viewErrors is None:
+            viewErrors, _ = Resolution.reprojectionErrors(worldPtsList, imgPtsList, cameraMatrix, distCoefficients, rvecs, tvecs)
+        viewErrors = np.asarray(viewErrors)
+        if threshold is None:
+            median = np.median(viewErrors)
+            threshold = median + 3 * 1.4826 * np.median(np.abs(viewErrors - median))
+
+        maxRejected = min(int(maxRejectFraction * len(viewErrors)), len(viewErrors) - 3)
+        worst = [i for i in np.argsort(viewErrors)[::-1] if viewErrors[i] > threshold][:max(maxRejected, 0)]
+        if not worst:
+            return list(range(len(viewErrors))), cameraMatrix, reproductionError, distCoefficients, rvecs, tvecs
+
+        kept = [i for i in range(len(viewErrors)) if i not in worst]
+        reproductionError, cameraMatrix, distCoefficients, rvecs, tvecs = cv2.calibrateCamera(
+            [worldPtsList[i] for i in kept], [imgPtsList[i] for i in kept], imageSize,
+            cameraMatrix.copy(), distCoefficients.copy(), flags=cv2.CALIB_USE_INTRINSIC_GUESS)
+        return kept, cameraMatrix, reproductionError, distCoefficients, rvecs, tvecs
+
+    #Accuracy check for coarse-to-fine detection: calibrates the same images with full resolution and downscaled detection
+    #and prints the reprojection error, detection time and how far the refined corners moved between the two paths
+    def compareDetectionModes(paths=None, maxDetectSide=1024, workers=None):
+        images = Resolution.imgs if paths is None else ImageSource(paths)
+        modes = [("full resolution", 0, False), ("coarse-to-fine", maxDetectSide, True)]
+        corners = {}
+        for name, side, fast in modes:
+            start = time.perf_counter()
+            worldPtsList, imgPtsList, imageSize, timings = Resolution.findCorners(images, workers, maxDetectSide=side, fastCheck=fast)
+            detectSeconds = time.perf_counter() - start
+            reproductionError = cv2.calibrateCamera(worldPtsList, imgPtsList, imageSize, None, None)[0]
+            foundPaths = [path for path, _, found in timings if found]
+            corners[name] = dict(zip(foundPaths, imgPtsList))
+            print('{:<16} boards {:>3}/{:<3} detection {:.2f}s  reprojection error {:.4f}'.format(
+                name, len(imgPtsList), len(timings), detectSeconds, reproductionError))
+
+        shared = corners[modes[0][0]].keys() & corners[modes[1][0]].keys()
+        if shared:
+            shift = max(float(np.abs(corners[modes[0][0]][p] - corners[modes[1][0]][p]).max()) for p in shared)
+            print('Largest corner difference between modes (pixels): {:.4f}'.format(shift))
+
 
 if __name__ == '__main__':
-    Resolution.calibrate()
\ No newline at end of file
+    if '--compare' in sys.argv:
+        Resolution.compareDetectionModes()
+    else:
+        Resolution.calibrate(rejectOutliers='--reject-outliers' in sys.argv)
\ No newline at end of file
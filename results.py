@@ -0,0 +1,75 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+# Everything the analysis stage of a report measured, independent of how it is rendered or which thresholds are applied
+# Saved as JSON, so a report can be re-rendered (e.g. after a layout or threshold change) without recalibrating
+class ReportResults:
+
+    fields = ("generated", "inputs", "fingerprint", "card_name", "reference_colors", "rows", "cols",
+              "focus_value", "camera_matrix", "dist_coefficients", "reprojection_error",
+              "light_intensity", "light_statistics", "measured_bgr", "errors")
+
+    def __init__(self, **values):
+        unknown = set(values) - set(ReportResults.fields)
+        if unknown:
+            raise ValueError(f"Unknown result field(s): {sorted(unknown)}")
+        self.generated = datetime.now().isoformat(timespec="seconds")
+        self.inputs = {}
+        self.fingerprint = []
+        self.card_name = ""
+        self.reference_colors = {}
+        self.rows = 6
+        self.cols = 4
+        # Invalid values indicating the metric could not be computed, the error is kept in errors
+        self.focus_value = -1.0
+        self.camera_matrix = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+        self.dist_coefficients = [0.0, 0.0, 0.0, 0.0, 0.0]
+        self.reprojection_error = float("inf")
+        self.light_intensity = -1.0
+        # Histogram, percentiles, clipping and uniformity grid, see Color.light_intensity_statistics
+        self.light_statistics = {}
+        self.measured_bgr = []
+        self.errors = {}
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    # Size and modification time of every input file and the analysis settings, cached results are only reused while
+    # these are unchanged. The settings are stored as their JSON form, so a fingerprint loaded from disk compares equal
+    def input_fingerprint(paths, settings=None):
+        fingerprint = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                fingerprint.append([path, stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                fingerprint.append([path, None, None])
+        if settings is not None:
+            fingerprint.append(["settings", json.loads(json.dumps(settings))])
+        return fingerprint
+
+    def to_dict(self):
+        values = {}
+        for name in ReportResults.fields:
+            value = getattr(self, name)
+            if isinstance(value, np.ndarray):
+                value = value.tolist()
+            elif isinstance(value, np.generic):
+                value = value.item()
+            values[name] = value
+        values["measured_bgr"] = [np.asarray(color, dtype=float).tolist() for color in self.measured_bgr]
+        return values
+
+    def from_dict(values):
+        return ReportResults(**{name: values[name] for name in ReportResults.fields if name in values})
+
+    def save(self, path):
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def load(path):
+        with open(path) as f:
+            return ReportResults.from_dict(json.load(f))
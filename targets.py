@@ -0,0 +1,156 @@
+import numpy as np
+import cv2
+
+#Calibration targets for Resolution.findCorners / calibrate
+#A target finds its points in a grayscale image and knows where those points are on the board:
+#   detect(gray, maxDetectSide, fastCheck) -> (image points (N, 1, 2) float32, ids) or (None, None) if it was not found
+#       ids are the indices of the detected points among all points of the board, None when every point was found
+#   objectPoints(ids) -> (N, 3) float32 board coordinates of those points (z = 0)
+#   params() -> everything that changes the detection, part of the CornerCache key
+#Targets are plain picklable objects so they can be sent to worker processes
+class Target:
+    #Fewest points a view needs to be used for calibration
+    minPoints = 4
+
+    def detect(self, gray, maxDetectSide=0, fastCheck=False):
+        raise NotImplementedError
+
+    #Whether the points with these ids can be used for calibration: at least minPoints of them and not all on one line
+    #of the board (a single row of a partly visible board), calibrateCamera cannot initialize from such a view
+    def usable(self, ids=None):
+        points = self.objectPoints(ids)[:, :2]
+        if len(points) < self.minPoints:
+            return False
+        return np.linalg.matrix_rank(points - points.mean(axis=0)) == 2
+
+    def objectPoints(self, ids=None):
+        points = self._boardPoints()
+        return points if ids is None else points[np.asarray(ids).ravel()]
+
+    def _boardPoints(self):
+        raise NotImplementedError
+
+    def params(self):
+        raise NotImplementedError
+
+    #Downscaled copy of gray whose longest side is at most maxDetectSide, and the factor back to full resolution
+    def _detectImage(gray, maxDetectSide):
+        if maxDetectSide and max(gray.shape) > maxDetectSide:
+            scale = max(gray.shape) / maxDetectSide
+            return cv2.resize(gray, None, fx=1.0/scale, fy=1.0/scale, interpolation=cv2.INTER_AREA), scale
+        return gray, 1.0
+
+
+#Checkerboard with nRows x nCols inner corners (the original target of this project), the whole board has to be visible
+class Chessboard(Target):
+    def __init__(self, nRows=9, nCols=6, squareSize=1.0, subPixWindow=(11, 11),
+                 terminationCriteria=(cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)):
+        self.nRows = nRows
+        self.nCols = nCols
+        self.squareSize = squareSize
+        self.subPixWindow = subPixWindow
+        self.terminationCriteria = terminationCriteria
+
+    def detect(self, gray, maxDetectSide=0, fastCheck=False):
+        flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE
+        if fastCheck:
+            flags += cv2.CALIB_CB_FAST_CHECK
+
+        detectImg, scale = Target._detectImage(gray, maxDetectSide)
+        cornersFound, cornersOrg = cv2.findChessboardCorners(detectImg, (self.nRows, self.nCols), flags=flags)
+        if cornersFound != True:
+            return None, None
+        if scale != 1.0:
+            #Back to full resolution coordinates (pixel centers), cornerSubPix then pulls them onto the real corners
+            cornersOrg = ((cornersOrg + 0.5) * scale - 0.5).astype(np.float32)
+        #Finding more accurate location of the corners
+        return cv2.cornerSubPix(gray, cornersOrg, self.subPixWindow, (-1,-1), self.terminationCriteria), None
+
+    def _boardPoints(self):
+        points = np.zeros((self.nRows*self.nCols, 3), np.float32)
+        points[:, :2] = np.mgrid[0:self.nRows, 0:self.nCols].T.reshape(-1, 2) * self.squareSize
+        return points
+
+    #Same key the chessboard-only pipeline used, so existing corner caches stay valid
+    def params(self):
+        return (self.nRows, self.nCols, self.subPixWindow, self.terminationCriteria)
+
+
+#Grid of nRows x nCols circles (nRows circles per grid row); asymmetric grids have every other row shifted by half a spacing
+#The whole grid has to be visible. Circle centers come from blob detection, which needs the full resolution image,
+#so maxDetectSide and fastCheck do not apply
+class CircleGrid(Target):
+    def __init__(self, nRows=4, nCols=11, spacing=1.0, asymmetric=True):
+        self.nRows = nRows
+        self.nCols = nCols
+        self.spacing = spacing
+        self.asymmetric = asymmetric
+
+    def detect(self, gray, maxDetectSide=0, fastCheck=False):
+        flags = cv2.CALIB_CB_ASYMMETRIC_GRID if self.asymmetric else cv2.CALIB_CB_SYMMETRIC_GRID
+        found, centers = cv2.findCirclesGrid(gray, (self.nRows, self.nCols), flags=flags)
+        if not found:
+            return None, None
+        return centers.astype(np.float32), None
+
+    def _boardPoints(self):
+        row, col = np.mgrid[0:self.nCols, 0:self.nRows]
+        x = 2 * col + row % 2 if self.asymmetric else col
+        points = np.zeros((self.nRows*self.nCols, 3), np.float32)
+        points[:, 0] = x.ravel() * self.spacing
+        points[:, 1] = row.ravel() * self.spacing
+        return points
+
+    def params(self):
+        return ("circles", self.nRows, self.nCols, self.asymmetric)
+
+
+#ChArUco board: a checkerboard with an ArUco marker in every white square. Each corner is identified by its markers,
+#so a board that is partly out of frame or occluded still yields the corners that are visible (at least minCorners of them,
+#spread over more than one board row and column) and the frame does not have to be captured again
+class Charuco(Target):
+    def __init__(self, squaresX=7, squaresY=5, squareLength=1.0, markerLength=0.7, dictionary="DICT_5X5_100", minCorners=6,
+                 subPixWindow=(11, 11), terminationCriteria=(cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)):
+        self.squaresX = squaresX
+        self.squaresY = squaresY
+        self.squareLength = squareLength
+        self.markerLength = markerLength
+        self.dictionary = dictionary
+        self.minPoints = minCorners
+        self.subPixWindow = subPixWindow
+        self.terminationCriteria = terminationCriteria
+        self._detector = None
+
+    #The OpenCV board and detector objects cannot be pickled, they are created on first use in every process
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_detector"] = None
+        return state
+
+    def board(self):
+        return self.detector().getBoard()
+
+    def detector(self):
+        if self._detector is None:
+            dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, self.dictionary))
+            board = cv2.aruco.CharucoBoard((self.squaresX, self.squaresY), self.squareLength, self.markerLength, dictionary)
+            self._detector = cv2.aruco.CharucoDetector(board)
+        return self._detector
+
+    def detect(self, gray, maxDetectSide=0, fastCheck=False):
+        detectImg, scale = Target._detectImage(gray, maxDetectSide)
+        charucoCorners, charucoIds, markerCorners, markerIds = self.detector().detectBoard(detectImg)
+        if charucoIds is None or not self.usable(charucoIds):
+            return None, None
+        if scale != 1.0:
+            charucoCorners = ((charucoCorners + 0.5) * scale - 0.5).astype(np.float32)
+            charucoCorners = cv2.cornerSubPix(gray, charucoCorners, self.subPixWindow, (-1,-1), self.terminationCriteria)
+        return charucoCorners.astype(np.float32), charucoIds.ravel().astype(np.int32)
+
+    #Board coordinates of the inner corners in id order, as board.matchImagePoints would pair them
+    def _boardPoints(self):
+        return np.asarray(self.board().getChessboardCorners(), dtype=np.float32).reshape(-1, 3)
+
+    def params(self):
+        return ("charuco", self.squaresX, self.squaresY, self.markerLength / self.squareLength, self.dictionary, self.minPoints,
+                self.subPixWindow, self.terminationCriteria)
@@ -0,0 +1,59 @@
+import warnings
+import numpy as np
+import cv2
+import pytest
+from colorbalance import Color
+
+
+#Card of rows x cols saturated patches of side patch, separated by a black grid border pixels wide
+def card_image(patch=120, border=16, rows=6, cols=4):
+    rng = np.random.default_rng(0)
+    hsv = np.stack([rng.integers(0, 180, rows * cols), rng.integers(120, 256, rows * cols), rng.integers(120, 256, rows * cols)], axis=-1)
+    colors = cv2.cvtColor(hsv.astype(np.uint8).reshape(rows, cols, 3), cv2.COLOR_HSV2BGR)
+    card = np.zeros((rows * patch + (rows + 1) * border, cols * patch + (cols + 1) * border, 3), np.uint8)
+    for r in range(rows):
+        for c in range(cols):
+            y, x = border + r * (patch + border), border + c * (patch + border)
+            card[y:y + patch, x:x + patch] = colors[r, c]
+    return card, colors
+
+
+#The card rotated by angle degrees in the middle of a gray frame
+def scene(card, angle, height=2000, width=2400):
+    h, w = card.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    M[:, 2] += (width / 2 - w / 2, height / 2 - h / 2)
+    inside = cv2.warpAffine(np.full((h, w), 255, np.uint8), M, (width, height)) > 0
+    img = np.full((height, width, 3), 128, np.uint8)
+    img[inside] = cv2.warpAffine(card, M, (width, height))[inside]
+    return img
+
+
+@pytest.mark.parametrize("patch, border", [(120, 2), (120, 16), (60, 30), (120, 40)])
+@pytest.mark.parametrize("angle", [0, 10, -20, 30, 44])
+def test_colorbalance_any_grid_width_and_rotation(patch, border, angle):
+    card, colors = card_image(patch, border)
+    img = scene(card, angle)
+    #A saturated object next to the card that is larger than one patch
+    cv2.circle(img, (150, 150), 80, (0, 0, 255), -1)
+    measured = np.array(Color.colorbalance(img)).reshape(colors.shape)
+    np.testing.assert_array_equal(measured, colors)
+
+
+#A single colored square does not look like a 6 x 4 card, nothing is sampled
+def test_locate_card_rejects_wrong_layout():
+    img = np.full((2000, 2400, 3), 128, np.uint8)
+    img[800:1000, 900:1100] = (0, 200, 0)
+    with pytest.raises(ValueError):
+        Color.locate_card(img)
+
+
+def test_light_intensity_grid_larger_than_image():
+    gray = np.arange(6, dtype=np.uint8).reshape(2, 3) * 40
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        stats = Color.light_intensity_statistics(gray, grid=(4, 4))
+    np.testing.assert_array_equal(stats["grid"], gray)
+    assert stats["uniformity"] == 0.0
+    with pytest.raises(ValueError):
+        Color.light_intensity_statistics(gray, grid=(0, 4))
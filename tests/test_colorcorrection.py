@@ -0,0 +1,32 @@
+import numpy as np
+from colorcards import small24_color_card
+from colorcorrection import ColorCorrection
+from colordifference import ColorDifference
+
+
+def fitted(model, space):
+    #A camera that mixes the channels and lifts the blacks a little, as in the benchmark
+    mixing = np.array([[0.85, 0.12, 0.03], [0.08, 0.80, 0.12], [0.02, 0.15, 0.83]])
+    reference = small24_color_card.rgb.astype(np.float64)
+    measured = np.clip(ColorDifference.linear_to_srgb(ColorDifference.srgb_to_linear(reference) @ mixing.T * 0.9 + 0.01), 0, 255)
+    return ColorCorrection.fit(measured, reference, model, space)
+
+
+#The matrix paths of apply agree with the exact correction up to rounding
+def test_matrix_apply_matches_correct_rgb():
+    img = np.random.default_rng(1).integers(0, 256, (300, 400, 3), dtype=np.uint8)
+    for model in ("3x3", "3x4"):
+        for space in ColorCorrection.spaces:
+            ccm = fitted(model, space)
+            exact = ccm.correct_rgb(img[..., ::-1])[..., ::-1]
+            assert np.abs(ccm.apply(img) - exact).max() < 1.0
+
+
+#The 3D LUT of the root-polynomial model interpolates before clipping and before the conversion to sRGB
+def test_root_polynomial_apply_matches_correct_rgb():
+    img = np.random.default_rng(1).integers(0, 256, (300, 400, 3), dtype=np.uint8)
+    for space, maxError in (("srgb", 1.0), ("linear", 4.0)):
+        ccm = fitted("root-polynomial", space)
+        error = np.abs(ccm.apply(img) - ccm.correct_rgb(img[..., ::-1])[..., ::-1])
+        assert error.max() < maxError
+        assert np.percentile(error, 99.9) < 1.0
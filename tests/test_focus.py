@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import cv2
+from focus import Focus
+
+
+def frame(height=240, width=320):
+    img = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def test_compute_all_matches_float64():
+    img = frame()
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    values = Focus.computeAll(img)
+    magnitude = np.hypot(cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3), cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3))
+    assert np.isclose(values["laplacian"], np.var(cv2.Laplacian(gray, cv2.CV_64F)), rtol=1e-5)
+    assert np.isclose(values["tenengrad"], magnitude.mean(), rtol=1e-5)
+    assert np.isclose(values["brenner"], np.sum((gray[:, 2:] - gray[:, :-2]) ** 2))
+    assert np.isclose(values["sobelVariance"], magnitude.mean() + gray.var(), rtol=1e-5)
+
+
+def test_scratch_buffers_released_and_capped():
+    img = frame()
+    Focus.releaseBuffers()
+    Focus.computeAll(img)
+    assert Focus.scratchBytes() == 240 * 320 * (1 + 4 + 4)
+    Focus.releaseBuffers()
+    assert Focus.scratchBytes() == 0
+
+    maxScratchBytes = Focus.maxScratchBytes
+    Focus.maxScratchBytes = 1024
+    try:
+        values = Focus.computeAll(img)
+        assert Focus.scratchBytes() == 0
+    finally:
+        Focus.maxScratchBytes = maxScratchBytes
+    assert values == pytest.approx(Focus.computeAll(img), rel=1e-6)
+    Focus.releaseBuffers()
@@ -0,0 +1,83 @@
+import numpy as np
+import cv2
+from cornercache import CornerCache
+from resolution import Resolution
+from targets import Chessboard, Charuco
+
+
+#Grayscale image of a chessboard with nRows x nCols inner corners, squares of side square pixels
+def chessboard_image(nRows=9, nCols=6, square=60, margin=80):
+    height, width = (nCols + 1) * square + 2 * margin, (nRows + 1) * square + 2 * margin
+    img = np.full((height, width), 255, np.uint8)
+    for row in range(nCols + 1):
+        for col in range(nRows + 1):
+            if (row + col) % 2 == 0:
+                y, x = margin + row * square, margin + col * square
+                img[y:y + square, x:x + square] = 0
+    return img
+
+
+def test_chessboard_found_with_fast_check():
+    for fastCheck in (False, True):
+        corners, ids = Chessboard().detect(chessboard_image(), fastCheck=fastCheck)
+        assert corners is not None and corners.shape == (54, 1, 2)
+        assert ids is None
+
+
+#The fast check reaches OpenCV as a flag, and a frame without a board is still reported as not found
+def test_fast_check_rejects_boardless_frame(monkeypatch):
+    noise = np.random.default_rng(0).integers(0, 256, (1200, 1600), dtype=np.uint8)
+    noise = cv2.GaussianBlur(noise, (0, 0), 3)
+    findChessboardCorners = cv2.findChessboardCorners
+    calls = []
+
+    def recording(image, patternSize, corners=None, flags=0):
+        calls.append(flags)
+        return findChessboardCorners(image, patternSize, corners, flags)
+
+    monkeypatch.setattr(cv2, "findChessboardCorners", recording)
+    for fastCheck in (False, True):
+        corners, ids = Chessboard().detect(noise, fastCheck=fastCheck)
+        assert corners is None
+        assert bool(calls[-1] & cv2.CALIB_CB_FAST_CHECK) == fastCheck
+
+
+def charuco_image(target, visibleRows=None):
+    img = target.board().generateImage((1400, 1000), marginSize=60)
+    if visibleRows is not None:
+        #Blank out everything below the first visibleRows pixel rows, as if the board were partly out of frame
+        img[visibleRows:] = 255
+    return img
+
+
+def test_charuco_rejects_collinear_corners():
+    target = Charuco()
+    assert target.usable(None)
+    assert target.usable(np.arange(12))
+    #One board row and one diagonal of corners
+    assert not target.usable(np.arange(6))
+    assert not target.usable([0, 7, 14, 21])
+
+
+def test_charuco_partial_detection():
+    target = Charuco()
+    corners, ids = target.detect(charuco_image(target, 600))
+    assert corners is not None and sorted(ids) == list(range(12))
+    #Only the first row of corners is visible
+    corners, ids = target.detect(charuco_image(target, 460))
+    assert corners is None and ids is None
+
+
+#A degenerate view that got into the corner cache is not passed on to calibrateCamera
+def test_find_corners_drops_unusable_views(tmp_path):
+    target = Charuco()
+    paths = [str(tmp_path / "full.png"), str(tmp_path / "row.png")]
+    cv2.imwrite(paths[0], charuco_image(target))
+    cv2.imwrite(paths[1], charuco_image(target, 460))
+    cache = CornerCache(str(tmp_path / "cache"))
+    rowCorners, rowIds = target.detector().detectBoard(cv2.imread(paths[1], cv2.IMREAD_GRAYSCALE))[:2]
+    cache.put(cache.key(paths[1], target.params() + (0, False)), rowCorners, (1400, 1000), rowIds.ravel())
+
+    worldPtsList, imgPtsList, imageSize, timings = Resolution.findCorners(paths, workers=1, cache=cache, target=target)
+    assert len(worldPtsList) == len(imgPtsList) == 1
+    assert [found for _, _, found in timings] == [True, False]
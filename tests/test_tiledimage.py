@@ -0,0 +1,187 @@
+import struct
+import numpy as np
+import pytest
+import cv2
+from colorbalance import Color
+from focus import Focus
+from tiledimage import TiledImage
+
+
+def random_image(channels, height=61, width=37):
+    #Odd width so BMP rows are padded
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.random.default_rng(channels).integers(0, 256, shape, dtype=np.uint8)
+
+
+#Uncompressed BMP with a BITMAPINFOHEADER, rows stored top-down (negative height) or bottom-up, 24 or 32 bit BGR(A)
+#masks (red, green, blue) writes a 32 bit BI_BITFIELDS file, img then holds the bytes as stored
+def write_bmp(path, img, topDown, masks=None):
+    height, width, channels = img.shape
+    rowStride = ((width * channels * 8 + 31) // 32) * 4
+    rows = np.zeros((height, rowStride), np.uint8)
+    rows[:, :width * channels] = img.reshape(height, -1)
+    if not topDown:
+        rows = rows[::-1]
+    pixelOffset = 14 + 40 + (12 if masks else 0)
+    with open(path, "wb") as f:
+        f.write(b"BM" + struct.pack("<IHHI", pixelOffset + rows.nbytes, 0, 0, pixelOffset))
+        f.write(struct.pack("<IiiHHIIiiII", 40, width, -height if topDown else height, 1, channels * 8, 3 if masks else 0,
+                            rows.nbytes, 2835, 2835, 0, 0))
+        if masks:
+            f.write(struct.pack("<III", *masks))
+        f.write(rows.tobytes())
+
+
+#Little-endian baseline TIFF, uncompressed, rowsPerStrip rows per strip written back to back
+#pixels are as stored in the file (RGB order), extraTags are (tag, type, values) entries such as a ColorMap
+def write_tiff(path, pixels, photometric, rowsPerStrip=16, extraTags=()):
+    height, width = pixels.shape[:2]
+    samples = 1 if pixels.ndim == 2 else pixels.shape[2]
+    rowBytes = width * samples
+    stripCount = (height + rowsPerStrip - 1) // rowsPerStrip
+    pixelOffset = 8
+    offsets = [pixelOffset + i * rowsPerStrip * rowBytes for i in range(stripCount)]
+    counts = [min(rowsPerStrip, height - i * rowsPerStrip) * rowBytes for i in range(stripCount)]
+    tags = [(256, 4, [width]), (257, 4, [height]), (258, 3, [8] * samples), (259, 3, [1]), (262, 3, [photometric]),
+            (273, 4, offsets), (277, 3, [samples]), (278, 4, [rowsPerStrip]), (279, 4, counts)] + list(extraTags)
+    tags.sort()
+
+    ifdOffset = pixelOffset + pixels.nbytes
+    dataOffset = ifdOffset + 2 + 12 * len(tags) + 4
+    entries, data = b"", b""
+    for tag, fieldType, values in tags:
+        code = {3: "H", 4: "I"}[fieldType]
+        raw = struct.pack("<" + code * len(values), *values)
+        if len(raw) <= 4:
+            entries += struct.pack("<HHI", tag, fieldType, len(values)) + raw.ljust(4, b"\0")
+        else:
+            entries += struct.pack("<HHII", tag, fieldType, len(values), dataOffset + len(data))
+            data += raw
+    with open(path, "wb") as f:
+        f.write(b"II*\0" + struct.pack("<I", ifdOffset))
+        f.write(pixels.tobytes())
+        f.write(struct.pack("<H", len(tags)) + entries + struct.pack("<I", 0) + data)
+
+
+def assert_matches_imread(path, mapped, flags=cv2.IMREAD_UNCHANGED):
+    image = TiledImage.open(str(path))
+    expected = cv2.imread(str(path), flags)
+    assert image.mapped == mapped
+    assert image.shape == expected.shape
+    np.testing.assert_array_equal(image.read(), expected)
+    #Strips cover the image in order and agree with the full read
+    np.testing.assert_array_equal(np.concatenate([strip for _, _, strip in image.strips(7)]), expected)
+    return image
+
+
+def test_bmp_top_down_and_bottom_up(tmp_path):
+    for channels in (3, 4):
+        for topDown in (True, False):
+            path = tmp_path / f"{channels}_{topDown}.bmp"
+            img = random_image(channels)
+            write_bmp(str(path), img, topDown)
+            image = assert_matches_imread(path, True, cv2.IMREAD_COLOR)
+            np.testing.assert_array_equal(image.read(), img[:, :, :3])
+
+
+def test_bmp_bitfields(tmp_path):
+    bgra = random_image(4)
+    path = tmp_path / "bgra.bmp"
+    write_bmp(str(path), bgra, True, masks=(0x00FF0000, 0x0000FF00, 0x000000FF))
+    image = TiledImage.open(str(path))
+    assert image.mapped
+    np.testing.assert_array_equal(image.read(), bgra[:, :, :3])
+    #Bytes stored in RGBA order are reordered by their masks (cv2.imread would return them as if they were BGR)
+    path = tmp_path / "rgba.bmp"
+    write_bmp(str(path), np.ascontiguousarray(bgra[:, :, [2, 1, 0, 3]]), False, masks=(0x000000FF, 0x0000FF00, 0x00FF0000))
+    image = TiledImage.open(str(path))
+    assert image.mapped
+    np.testing.assert_array_equal(image.read(), bgra[:, :, :3])
+    np.testing.assert_array_equal(np.concatenate([strip for _, _, strip in image.strips(7)]), bgra[:, :, :3])
+    #10 bits per channel (2:10:10:10) are scaled to 8 bits
+    levels = np.random.default_rng(3).integers(0, 1024, (5, 9, 3), dtype=np.uint32)
+    words = (levels[:, :, 0] << 20) | (levels[:, :, 1] << 10) | levels[:, :, 2]
+    path = tmp_path / "10bit.bmp"
+    write_bmp(str(path), words.astype("<u4").view(np.uint8).reshape(5, 9, 4), True, masks=(0x3FF00000, 0x000FFC00, 0x000003FF))
+    np.testing.assert_array_equal(TiledImage.open(str(path)).read(), np.round(levels[:, :, ::-1] * 255 / 1023).astype(np.uint8))
+
+
+#Truncated headers fail like any other unreadable file instead of with a struct.error or KeyError
+def test_truncated_headers(tmp_path):
+    for name, data in (("short.bmp", b"BM" + bytes(20)), ("short.tif", b"II*\x00" + struct.pack("<IH", 8, 0))):
+        path = tmp_path / name
+        path.write_bytes(data)
+        with pytest.raises(FileNotFoundError):
+            TiledImage.open(str(path))
+
+
+def test_bmp_written_by_opencv(tmp_path):
+    path = tmp_path / "color.bmp"
+    cv2.imwrite(str(path), random_image(3))
+    assert_matches_imread(path, True)
+    #8 bit BMPs have a palette and are decoded instead
+    path = tmp_path / "gray.bmp"
+    cv2.imwrite(str(path), random_image(1))
+    assert_matches_imread(path, False)
+
+
+def test_tiff_gray_and_rgb(tmp_path):
+    gray = random_image(1)
+    write_tiff(str(tmp_path / "gray.tif"), gray, photometric=1)
+    np.testing.assert_array_equal(assert_matches_imread(tmp_path / "gray.tif", True).read(), gray)
+
+    bgr = random_image(3)
+    write_tiff(str(tmp_path / "rgb.tif"), bgr[:, :, ::-1], photometric=2)
+    np.testing.assert_array_equal(assert_matches_imread(tmp_path / "rgb.tif", True).read(), bgr)
+
+    #RGBA: the alpha channel is dropped like the BMP path does
+    bgra = random_image(4)
+    path = tmp_path / "rgba.tif"
+    write_tiff(str(path), np.ascontiguousarray(bgra[:, :, [2, 1, 0, 3]]), photometric=2, extraTags=[(338, 3, [2])])
+    image = TiledImage.open(str(path))
+    assert image.mapped
+    np.testing.assert_array_equal(image.read(), bgra[:, :, :3])
+
+
+def test_tiff_written_by_opencv(tmp_path):
+    bgr = random_image(3)
+    path = tmp_path / "plain.tif"
+    cv2.imwrite(str(path), bgr, [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+    assert_matches_imread(path, True)
+    #LZW (OpenCV's default) is decoded instead of mapped
+    path = tmp_path / "lzw.tif"
+    cv2.imwrite(str(path), bgr)
+    assert_matches_imread(path, False)
+
+
+#Palette and WhiteIsZero files store indices / inverted values, mapping them as gray would give wrong pixels
+def test_tiff_photometric_fallback(tmp_path):
+    indices = random_image(1)
+    palette = np.random.default_rng(7).integers(0, 65536, (3, 256))
+    path = tmp_path / "palette.tif"
+    write_tiff(str(path), indices, photometric=3, extraTags=[(320, 3, palette.ravel().tolist())])
+    assert_matches_imread(path, False)
+
+    path = tmp_path / "miniswhite.tif"
+    write_tiff(str(path), indices, photometric=0)
+    image = TiledImage.open(str(path))
+    assert not image.mapped
+    np.testing.assert_array_equal(image.read(), cv2.imread(str(path), cv2.IMREAD_UNCHANGED))
+
+
+#The strip by strip analyzers give the same values as the full image
+def test_strip_analysis_matches_full_image(tmp_path):
+    img = random_image(3, 1000, 301)
+    path = tmp_path / "large.bmp"
+    cv2.imwrite(str(path), img)
+    image = TiledImage.open(str(path))
+    assert image.mapped
+
+    assert Focus.computeSobelVarianceTiled(image, stripRows=128) == Focus.computeAll(img, ["sobelVariance"])["sobelVariance"]
+
+    statistics = Color.light_intensity_statistics(image, stripRows=128)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    assert statistics["mean"] == gray.mean()
+    assert statistics["min"] == gray.min() and statistics["max"] == gray.max()
+    assert statistics["histogram"] == np.bincount(gray.ravel(), minlength=256).tolist()
+    assert np.isclose(statistics["grid"][0][0], gray[:250, :75].mean())
@@ -0,0 +1,23 @@
+import numpy as np
+from undistort import MapCache, Undistorter
+
+
+def test_map_cache_round_trip_and_eviction(tmp_path):
+    cameraMatrix = np.array([[500.0, 0.0, 160.0], [0.0, 500.0, 120.0], [0.0, 0.0, 1.0]])
+    distCoefficients = np.array([-0.2, 0.05, 0.0, 0.0, 0.0])
+    cache = MapCache(str(tmp_path / "maps"))
+    built = Undistorter(cameraMatrix, distCoefficients, (320, 240), cache=cache)
+    key = cache.key(cameraMatrix, distCoefficients, (320, 240), 0.0)
+    map1, map2, newCameraMatrix, roi = cache.get(key)
+    np.testing.assert_array_equal(map1, built.map1)
+    np.testing.assert_array_equal(map2, built.map2)
+    np.testing.assert_array_equal(newCameraMatrix, built.newCameraMatrix)
+    assert roi == tuple(built.roi)
+    assert cache.get(cache.key(cameraMatrix, distCoefficients, (320, 240), 1.0)) is None
+
+    #A second entry pushes the cache past maxBytes, the older one is evicted
+    cache.maxBytes = map1.nbytes + map2.nbytes + 4096
+    Undistorter(cameraMatrix, distCoefficients, (320, 240), alpha=1.0, cache=cache)
+    assert cache.get(key) is None
+    cache.clear()
+    assert cache.get(cache.key(cameraMatrix, distCoefficients, (320, 240), 1.0)) is None
@@ -0,0 +1,169 @@
+import struct
+import numpy as np
+import cv2
+
+#Strip-by-strip access to large images without decoding them into one array
+#Uncompressed 8-bit BMP and TIFF files are memory-mapped, so a strip is a NumPy view of the file and only the pages
+#that are touched are read. Anything else (compressed TIFF, PNG, JPEG, ...) falls back to cv2.imread
+#Strips are BGR (or 2D grayscale) like cv2.imread, so the analyzers can be run on them unchanged
+#
+#   image = TiledImage.open("stitched.bmp")
+#   for y0, y1, strip in image.strips(512):
+#       ...
+class TiledImage:
+    def __init__(self, path, height, width, channels, rowsReader, mapped):
+        self.path = path
+        self.height = height
+        self.width = width
+        self.channels = channels
+        #rowsReader(y0, y1) returns rows y0..y1 as an array in file channel order
+        self._rowsReader = rowsReader
+        #True when the pixels are memory-mapped rather than decoded into memory
+        self.mapped = mapped
+        self._reverseChannels = False
+
+    @property
+    def shape(self):
+        return (self.height, self.width) if self.channels == 1 else (self.height, self.width, self.channels)
+
+    def open(path):
+        with open(path, "rb") as f:
+            magic = f.read(4)
+        try:
+            if magic[:2] == b"BM":
+                return TiledImage._openBmp(path)
+            if magic in (b"II*\x00", b"MM\x00*"):
+                return TiledImage._openTiff(path)
+        #Layouts the fast paths do not handle and truncated or malformed headers are left to OpenCV
+        except (ValueError, KeyError, struct.error):
+            pass
+        return TiledImage._openDecoded(path)
+
+    #Wraps an image that is already in memory (BGR or grayscale, as from cv2.imread) so the strip analyzers accept it too
+    def fromArray(img, path=None):
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        return TiledImage(path, img.shape[0], img.shape[1], channels, lambda y0, y1: img[y0:y1], False)
+
+    def _openDecoded(path):
+        img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise FileNotFoundError(f"Could not read image: {path}")
+        if img.dtype != np.uint8:
+            img = cv2.convertScaleAbs(img, alpha=255.0 / np.iinfo(img.dtype).max) if img.dtype.kind == "u" else img.astype(np.uint8)
+        if img.ndim == 3 and img.shape[2] == 4:
+            img = img[:, :, :3]
+        return TiledImage.fromArray(img, path)
+
+    def _openBmp(path):
+        with open(path, "rb") as f:
+            header = f.read(66)
+        pixelOffset, headerSize = struct.unpack_from("<II", header, 10)
+        #OS/2 BITMAPCOREHEADER files have 16 bit sizes and a different layout
+        if headerSize < 40:
+            raise ValueError("Unsupported BMP layout")
+        width, height, planes, bitsPerPixel, compression = struct.unpack_from("<iiHHI", header, 18)
+        #BI_RGB, or BI_BITFIELDS for 32 bit
+        if bitsPerPixel not in (24, 32) or compression not in (0, 3) or (compression == 3 and bitsPerPixel != 32):
+            raise ValueError("Unsupported BMP layout")
+        #The red, green and blue masks follow the 40 byte header, or are its next fields in V4/V5 headers, at 54 either way
+        #The standard BGRA byte order is mapped like BI_RGB, other masks are decoded per strip (cv2.imread ignores them)
+        masks = struct.unpack_from("<III", header, 54) if compression == 3 else None
+        if masks is not None and 0 in masks:
+            raise ValueError("Unsupported BMP layout")
+        if masks == (0x00FF0000, 0x0000FF00, 0x000000FF):
+            masks = None
+        topDown = height < 0
+        height = abs(height)
+        channels = bitsPerPixel // 8
+        rowStride = ((width * bitsPerPixel + 31) // 32) * 4
+
+        rows = np.memmap(path, dtype=np.uint8, mode="r", offset=pixelOffset, shape=(height, rowStride))
+        if masks is not None:
+            words = rows.view("<u4")
+            if not topDown:
+                words = words[::-1]
+            #Blue, green and red scaled from their mask width to 0-255
+            return TiledImage(path, height, width, 3,
+                              lambda y0, y1: np.stack([TiledImage._bitfield(words[y0:y1], mask) for mask in masks[::-1]], axis=-1), True)
+        #Drop the row padding and view each row as pixels, BMP rows are already BGR(A)
+        pixels = np.lib.stride_tricks.as_strided(rows, shape=(height, width, channels), strides=(rowStride, channels, 1))
+        if not topDown:
+            pixels = pixels[::-1]
+        if channels == 4:
+            pixels = pixels[:, :, :3]
+        return TiledImage(path, height, width, 3, lambda y0, y1: pixels[y0:y1], True)
+
+    def _bitfield(words, mask):
+        shift = (mask & -mask).bit_length() - 1
+        top = mask >> shift
+        values = ((words & mask) >> shift).astype(np.uint64)
+        return ((values * 255 + top // 2) // top).astype(np.uint8)
+
+    def _openTiff(path):
+        with open(path, "rb") as f:
+            data = f.read(8)
+            endian = "<" if data[:2] == b"II" else ">"
+            ifdOffset, = struct.unpack(endian + "I", data[4:8])
+            f.seek(ifdOffset)
+            count, = struct.unpack(endian + "H", f.read(2))
+            entries = f.read(12 * count)
+
+            typeSizes = {1: ("B", 1), 3: ("H", 2), 4: ("I", 4)}
+            tags = {}
+            for i in range(count):
+                tag, fieldType, valueCount, valueOffset = struct.unpack_from(endian + "HHI4s", entries, 12 * i)
+                if fieldType not in typeSizes:
+                    continue
+                code, size = typeSizes[fieldType]
+                raw = valueOffset
+                if size * valueCount > 4:
+                    position = struct.unpack(endian + "I", valueOffset)[0]
+                    f.seek(position)
+                    raw = f.read(size * valueCount)
+                tags[tag] = struct.unpack(endian + code * valueCount, raw[:size * valueCount])
+
+        width, height = tags[256][0], tags[257][0]
+        bits = tags.get(258, (1,))
+        compression = tags.get(259, (1,))[0]
+        samplesPerPixel = tags.get(277, (1,))[0]
+        planar = tags.get(284, (1,))[0]
+        if compression != 1 or planar != 1 or any(b != 8 for b in bits) or 273 not in tags or 322 in tags:
+            raise ValueError("Unsupported TIFF layout")
+        #Only BlackIsZero gray and RGB(A) can be used as they are stored, palette, WhiteIsZero, CMYK, YCbCr ... are decoded
+        photometric = tags.get(262, (None,))[0]
+        if not ((photometric == 1 and samplesPerPixel == 1) or (photometric == 2 and samplesPerPixel in (3, 4))):
+            raise ValueError("Unsupported TIFF layout")
+
+        offsets = tags[273]
+        rowBytes = width * samplesPerPixel
+        rowsPerStrip = tags.get(278, (height,))[0]
+        contiguous = all(offsets[i + 1] == offsets[i] + rowsPerStrip * rowBytes for i in range(len(offsets) - 1))
+        if not contiguous:
+            raise ValueError("Unsupported TIFF layout")
+
+        pixels = np.memmap(path, dtype=np.uint8, mode="r", offset=offsets[0], shape=(height, width, samplesPerPixel))
+        if samplesPerPixel == 1:
+            image = TiledImage(path, height, width, 1, lambda y0, y1: pixels[y0:y1, :, 0], True)
+        else:
+            #TIFF stores RGB(A), strips are flipped to BGR when they are handed out
+            image = TiledImage(path, height, width, 3, lambda y0, y1: pixels[y0:y1, :, :3], True)
+            image._reverseChannels = True
+        return image
+
+    #Rows y0..y1 as a BGR (or grayscale) array, a view of the file when possible
+    def rows(self, y0, y1):
+        strip = self._rowsReader(max(y0, 0), min(y1, self.height))
+        if self._reverseChannels:
+            return np.ascontiguousarray(strip[:, :, ::-1])
+        return strip
+
+    #Yields (y0, y1, strip) covering the image in order; strip holds rows y0-halo..y1+halo clipped to the image,
+    #so filters that need neighbouring rows see the same pixels they would in the full image
+    def strips(self, stripRows=512, halo=0):
+        for y0 in range(0, self.height, stripRows):
+            y1 = min(y0 + stripRows, self.height)
+            yield y0, y1, self.rows(y0 - halo, y1 + halo)
+
+    #The whole image as one array (decodes/copies everything, only for small images)
+    def read(self):
+        return np.ascontiguousarray(self.rows(0, self.height))
@@ -0,0 +1,103 @@
+import hashlib
+import numpy as np
+import cv2
+from cornercache import NpzCache
+
+#On-disk cache of undistortion maps, one .npz file per (calibration, image size, alpha)
+#Maps are stored in OpenCV's fixed-point form (CV_16SC2 coordinates + CV_16UC1 interpolation weights), half the size of
+#float maps and the fastest form for cv2.remap. Storage, eviction and clear() come from NpzCache (cornercache.py)
+class MapCache(NpzCache):
+    def __init__(self, cacheDir=".undistortcache", maxBytes=1024 * 1024 * 1024):
+        super().__init__(cacheDir, maxBytes)
+
+    #Hash of the calibration itself, so recalibrating a camera is a miss while re-opening the same one is a hit
+    def key(self, cameraMatrix, distCoefficients, imageSize, alpha):
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(cameraMatrix, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(distCoefficients, dtype=np.float64).ravel().tobytes())
+        digest.update(repr((tuple(int(v) for v in imageSize), float(alpha))).encode())
+        return digest.hexdigest()
+
+    #Returns (map1, map2, newCameraMatrix, roi), or None on a miss
+    def get(self, key):
+        return self._read(key, lambda entry: (entry["map1"], entry["map2"], entry["newCameraMatrix"],
+                                              tuple(int(v) for v in entry["roi"])))
+
+    #Stored uncompressed, loading is then little more than reading the file
+    def put(self, key, map1, map2, newCameraMatrix, roi):
+        self._write(key, False, map1=map1, map2=map2, newCameraMatrix=newCameraMatrix, roi=np.array(roi, np.int32))
+
+
+#Undistorts frames of one camera with maps built once by initUndistortRectifyMap, so each frame only costs a cv2.remap
+#alpha is as for getOptimalNewCameraMatrix: 0 keeps only valid pixels (cropped), 1 keeps every source pixel (black borders)
+#
+#   undistorter = Undistorter(cameraMatrix, distCoefficients, (width, height), cache=MapCache())
+#   for rectified in undistorter.stream(frames):
+#       Focus.computeAll(rectified)
+class Undistorter:
+    def __init__(self, cameraMatrix, distCoefficients, imageSize, alpha=0.0, cache=None):
+        self.cameraMatrix = np.asarray(cameraMatrix, dtype=np.float64)
+        self.distCoefficients = np.asarray(distCoefficients, dtype=np.float64)
+        self.imageSize = tuple(int(v) for v in imageSize)
+        self.alpha = alpha
+
+        key = cache.key(self.cameraMatrix, self.distCoefficients, self.imageSize, alpha) if cache is not None else None
+        cached = cache.get(key) if cache is not None else None
+        if cached is None:
+            newCameraMatrix, roi = cv2.getOptimalNewCameraMatrix(self.cameraMatrix, self.distCoefficients, self.imageSize, alpha)
+            map1, map2 = cv2.initUndistortRectifyMap(self.cameraMatrix, self.distCoefficients, None, newCameraMatrix,
+                                                     self.imageSize, cv2.CV_16SC2)
+            cached = map1, map2, newCameraMatrix, roi
+            if cache is not None:
+                cache.put(key, *cached)
+        self.map1, self.map2, self.newCameraMatrix, self.roi = cached
+
+    #Calibration saved in a report (see results.py), imageSize is the size of the frames that will be undistorted
+    def fromResults(results, imageSize, alpha=0.0, cache=None):
+        return Undistorter(results.camera_matrix, results.dist_coefficients, imageSize, alpha, cache)
+
+    def undistort(self, frame, interpolation=cv2.INTER_LINEAR):
+        if (frame.shape[1], frame.shape[0]) != self.imageSize:
+            raise ValueError(f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match the maps ({self.imageSize[0]}x{self.imageSize[1]})")
+        return cv2.remap(frame, self.map1, self.map2, interpolation, borderMode=cv2.BORDER_CONSTANT)
+
+    #Lazily undistorts an iterable of frames (a list, a FrameSource, ...)
+    def stream(self, frames, interpolation=cv2.INTER_LINEAR):
+        for frame in frames:
+            yield self.undistort(frame, interpolation)
+
+
+#Compares cv2.undistort (rebuilds the maps on every call) with remapping through the cached fixed-point maps
+#Run with: python undistort.py --benchmark
+def benchmark(width=2592, height=1944, frames=10):
+    import tempfile
+    import time
+
+    cameraMatrix = np.array([[2400.0, 0.0, width / 2], [0.0, 2400.0, height / 2], [0.0, 0.0, 1.0]])
+    distCoefficients = np.array([-0.25, 0.12, 0.001, -0.0005, -0.03])
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        cv2.undistort(frame, cameraMatrix, distCoefficients)
+    print(f"cv2.undistort per frame          {(time.perf_counter() - start) / frames * 1e3:7.1f} ms")
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        cache = MapCache(cacheDir)
+        start = time.perf_counter()
+        undistorter = Undistorter(cameraMatrix, distCoefficients, (width, height), 0.0, cache)
+        print(f"build maps (cache miss)          {(time.perf_counter() - start) * 1e3:7.1f} ms")
+        start = time.perf_counter()
+        undistorter = Undistorter(cameraMatrix, distCoefficients, (width, height), 0.0, cache)
+        print(f"load maps (cache hit)            {(time.perf_counter() - start) * 1e3:7.1f} ms")
+
+    start = time.perf_counter()
+    for _ in undistorter.stream(frame for _ in range(frames)):
+        pass
+    print(f"remap with fixed-point maps      {(time.perf_counter() - start) / frames * 1e3:7.1f} ms")
+
+
+if __name__ == '__main__':
+    import sys
+    if '--benchmark' in sys.argv:
+        benchmark()